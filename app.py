@@ -3,22 +3,47 @@
 import os
 from datetime import datetime, date, timedelta
 import calendar
-from flask import Flask, render_template, request, redirect, url_for
-from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import func, select
+from flask import Flask, Response, abort, jsonify, render_template, request, redirect, url_for, stream_template, stream_with_context
+from sqlalchemy import select
+from sqlalchemy.orm import scoped_session
 from dotenv import load_dotenv
 
-from database import DB_URI, Project, Task, ActivityLog
+from database import engine, SessionLocal, Project, Task, ActivityLog
+from queries import project_stats, tasks_by_deadline, record_activity, cumulative_activity
+from queries import archive_rows, iter_archive, encode_cursor
+from queries import SUGGEST_LIMIT, suggest_task_titles, suggest_project_names, project_id_by_name
+from queries import TASK_ACTIONS, MAX_BATCH_TASKS, apply_task_action
+from queries import REVIEW_PERIODS, review_period, review_summary, completions_by
+from cache import TableCache, enable_cross_process_invalidation
+from counters import read_counters
+from capture import MAX_BULK_TASKS, parse_text, bulk_create_tasks
+from transfer import TABLES as EXPORT_TABLES, FORMATS as EXPORT_FORMATS, iter_export
+from search import SEARCH_KINDS, TASK_STATUSES, search
+import metrics
 
 load_dotenv()
 
 app = Flask(__name__)
-app.config['SQLALCHEMY_DATABASE_URI'] = DB_URI
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-db = SQLAlchemy(app)
+# Сессия на запрос поверх общего с ботом движка (database.engine) и его пула соединений
+db_session = scoped_session(SessionLocal)
+metrics.init_app(app)
 
-with app.app_context():
-    db.create_all()
+@app.teardown_appcontext
+def _remove_session(exc):
+    db_session.remove()
+
+# Кэши сбрасываются и по изменениям из других воркеров и бота
+enable_cross_process_invalidation(engine)
+
+ANALYTICS_DEFAULT_DAYS = 90
+ANALYTICS_DEFAULT_TOP = 10
+ANALYTICS_MAX_TOP = 50
+SUGGEST_MAX_LIMIT = 50
+
+# Готовые HTML-страницы календаря; сбрасываются при любом изменении задач (и архива задач)
+calendar_cache = TableCache('tasks', 'tasks_archive', maxsize=24, ttl=60)
+# Выполненные задачи по дням года для тепловой карты ревью
+heatmap_cache = TableCache('tasks', 'tasks_archive', maxsize=8, ttl=300)
 
 @app.template_filter('format_datetime')
 def _format_datetime(value, format='%A, %d %B %Y'):
@@ -27,43 +52,73 @@ def _format_datetime(value, format='%A, %d %B %Y'):
     try: return datetime.fromisoformat(value).strftime(format)
     except (ValueError, TypeError): return value
 
+def _parse_date(value):
+    try: return datetime.strptime(value, '%Y-%m-%d').date()
+    except (ValueError, TypeError): return None
+
 def get_nav_data():
-    inbox_count = db.session.scalar(
-        select(func.count(Task.id)).filter_by(status='pending', is_today=False, project_id=None)
-    )
-    return {'inbox_count': inbox_count}
+    counters = read_counters(db_session)
+    return {'inbox_count': counters['inbox'], 'today_count': counters['today'], 'overdue_count': counters['overdue']}
 
 @app.route('/')
 def index():
-    inbox_tasks = db.session.execute(select(Task).filter_by(status='pending', is_today=False, project_id=None).order_by(Task.created_at)).scalars().all()
-    today_tasks_q = db.session.execute(select(Task).filter_by(status='pending', is_today=True)).scalars().all()
+    inbox_tasks = db_session.execute(select(Task).filter_by(status='pending', is_today=False, project_id=None).order_by(Task.created_at)).scalars().all()
+    today_tasks_q = db_session.execute(select(Task).filter_by(status='pending', is_today=True)).scalars().all()
     priority_map = {"high": 0, "medium": 1, "low": 2}
     today_tasks = sorted(today_tasks_q, key=lambda x: priority_map.get(x.priority, 2))
-    all_task_titles_q = db.session.execute(select(Task.title).distinct()).scalars().all()
-    all_projects_q = db.session.execute(select(Project.name).order_by(Project.name)).scalars().all()
-    return render_template('index.html', inbox_tasks=inbox_tasks, today_tasks=today_tasks, today_date=date.today(), nav_data=get_nav_data(), all_task_titles=all_task_titles_q, all_projects=all_projects_q)
+    return render_template('index.html', inbox_tasks=inbox_tasks, today_tasks=today_tasks, today_date=date.today(), nav_data=get_nav_data())
 
 @app.route('/projects')
 def projects_page():
-    all_projects = db.session.execute(select(Project).order_by(Project.name)).scalars().all()
-    projects_data = []
-    for p in all_projects:
-        total = len(p.tasks)
-        completed = db.session.scalar(select(func.count(Task.id)).filter_by(project_id=p.id, status='completed'))
-        progress = int((completed / total) * 100) if total > 0 else 0
-        projects_data.append({'id': p.id, 'name': p.name, 'total': total, 'completed': completed, 'progress': progress})
+    projects_data = project_stats(db_session)
     return render_template('projects.html', projects=projects_data, nav_data=get_nav_data())
 
 @app.route('/project/<project_name>')
 def project_detail_page(project_name):
-    project = db.session.execute(select(Project).filter_by(name=project_name)).scalar_one()
-    project_tasks = db.session.execute(select(Task).filter_by(project_id=project.id, status='pending').order_by(Task.created_at)).scalars().all()
+    project_id = project_id_by_name(db_session, project_name)
+    if project_id is None: abort(404)
+    project = {'id': project_id, 'name': project_name}
+    project_tasks = db_session.execute(select(Task).filter_by(project_id=project_id, status='pending').order_by(Task.created_at)).scalars().all()
     return render_template('project_detail.html', project=project, tasks=project_tasks, today_date=date.today(), nav_data=get_nav_data())
 
 @app.route('/archive')
 def archive_page():
-    completed_tasks = db.session.execute(select(Task).filter_by(status='completed').order_by(Task.completed_at.desc())).scalars().all()
-    return render_template('archive.html', tasks=completed_tasks, nav_data=get_nav_data())
+    filters = {'start': _parse_date(request.args.get('start')), 'end': _parse_date(request.args.get('end')), 'project_name': request.args.get('project', '').strip().lstrip('#') or None}
+    filter_args = {'start': request.args.get('start') or None, 'end': request.args.get('end') or None, 'project': filters['project_name']}
+    if request.args.get('all'):
+        # Весь архив одним потоком: строки рендерятся по мере чтения из курсора, память не растет
+        rows = iter_archive(db_session, **filters)
+        return Response(stream_with_context(stream_template('archive.html', tasks=rows, pager=None, filter_args=filter_args, nav_data=get_nav_data())))
+    rows, has_older, has_newer = archive_rows(db_session, after=request.args.get('after'), before=request.args.get('before'), **filters)
+    pager = {
+        'older': encode_cursor(rows[-1]) if rows and has_older else None,
+        'newer': encode_cursor(rows[0]) if rows and has_newer else None,
+    }
+    return render_template('archive.html', tasks=rows, pager=pager, filter_args=filter_args, nav_data=get_nav_data())
+
+EXPORT_MIMETYPES = {'csv': 'text/csv; charset=utf-8', 'jsonl': 'application/x-ndjson; charset=utf-8'}
+
+@app.route('/export/<table>.<fmt>')
+def export_table(table, fmt):
+    # Потоковая выгрузка целой таблицы: строки читаются серверным курсором и сразу уходят клиенту
+    if table not in EXPORT_TABLES or fmt not in EXPORT_FORMATS: abort(404)
+    filename = f"{table}-{date.today().isoformat()}.{fmt}"
+    return Response(stream_with_context(iter_export(db_session, table, fmt)), mimetype=EXPORT_MIMETYPES[fmt],
+                    headers={'Content-Disposition': f'attachment; filename="{filename}"'})
+
+@app.route('/search')
+def search_page():
+    q = request.args.get('q', '').strip()
+    kind = request.args.get('kind') if request.args.get('kind') in SEARCH_KINDS else 'all'
+    status = request.args.get('status') if request.args.get('status') in TASK_STATUSES else None
+    filters = {'project_name': request.args.get('project', '').strip().lstrip('#') or None, 'status': status,
+               'start': _parse_date(request.args.get('start')), 'end': _parse_date(request.args.get('end'))}
+    filter_args = {'q': q or None, 'kind': kind, 'status': status, 'project': filters['project_name'],
+                   'start': request.args.get('start') or None, 'end': request.args.get('end') or None}
+    page = request.args.get('page', 1, type=int)
+    results, has_next = search(db_session, q, kind=kind, page=page, **filters)
+    pager = {'prev': page - 1 if page > 1 else None, 'next': page + 1 if has_next else None}
+    return render_template('search.html', results=results, pager=pager, filter_args=filter_args, nav_data=get_nav_data())
 
 @app.route('/calendar', defaults={'year': None, 'month': None})
 @app.route('/calendar/<int:year>/<int:month>')
@@ -73,53 +128,166 @@ def calendar_page(year, month):
     prev = target_date.replace(day=1) - timedelta(days=1)
     next_month_date = (target_date.replace(day=28) + timedelta(days=4)).replace(day=1)
     nav = {'prev': {'year': prev.year, 'month': prev.month}, 'next': {'year': next_month_date.year, 'month': next_month_date.month}}
+    today = date.today()
+    cache_key = (target_date.year, target_date.month, today)
+    html = calendar_cache.get(cache_key)
+    if html is not None: return html
     cal = calendar.Calendar()
     month_days = cal.monthdatescalendar(target_date.year, target_date.month)
-    tasks_with_deadline = db.session.execute(select(Task).filter(Task.deadline != None)).scalars().all()
-    tasks_by_date = {}
-    for task in tasks_with_deadline:
-        if task.deadline:
-            deadline_str = task.deadline.isoformat()
-            if deadline_str not in tasks_by_date: tasks_by_date[deadline_str] = []
-            tasks_by_date[deadline_str].append(task)
-    return render_template('calendar.html', month_days=month_days, tasks_by_date=tasks_by_date, today=date.today(), current_month_date=target_date, nav=nav, nav_data=get_nav_data())
+    tasks_by_date = tasks_by_deadline(db_session, month_days[0][0], month_days[-1][-1])
+    html = render_template('calendar.html', month_days=month_days, tasks_by_date=tasks_by_date, today=today, current_month_date=target_date, nav=nav, nav_data=get_nav_data())
+    calendar_cache.set(cache_key, html)
+    return html
+
+REVIEW_LABELS = {'week': '%a, %d', 'month': '%d', 'year': '%b'}
+HEATMAP_LEVELS = 4
+# Годы, для которых у периода есть и предыдущий, и следующий день (date поддерживает только 1..9999)
+REVIEW_MIN_DATE, REVIEW_MAX_DATE = date(2, 1, 1), date(9998, 12, 31)
+
+def _heatmap_weeks(year, counts):
+    """Колонки-недели (пн..вс) тепловой карты года: ячейки {'date', 'count', 'level'} или None вне года."""
+    first, last = date(year, 1, 1), date(year, 12, 31)
+    peak = max(counts.values(), default=0)
+    day = first - timedelta(days=first.weekday())
+    weeks = []
+    while day <= last:
+        week = []
+        for _ in range(7):
+            if first <= day <= last:
+                count = counts.get(day, 0)
+                week.append({'date': day, 'count': count, 'level': -(-count * HEATMAP_LEVELS // peak) if count else 0})
+            else:
+                week.append(None)
+            day += timedelta(days=1)
+        weeks.append(week)
+    return weeks
 
 @app.route('/review')
 def review_page():
-    today = date.today()
-    start_of_week = today - timedelta(days=today.weekday())
-    labels = [(start_of_week + timedelta(days=i)).strftime('%a, %d') for i in range(7)]
-    data = [0] * 7
-    completed_this_week = db.session.execute(select(Task).filter(Task.status=='completed', Task.completed_at >= start_of_week, Task.completed_at < start_of_week + timedelta(days=7))).scalars().all()
-    for task in completed_this_week:
-        if task.completed_at: data[task.completed_at.weekday()] += 1
-    return render_template('review.html', labels=labels, data=data, total_completed=len(completed_this_week), nav_data=get_nav_data())
+    period = request.args.get('period') if request.args.get('period') in REVIEW_PERIODS else 'week'
+    anchor = min(max(_parse_date(request.args.get('date')) or date.today(), REVIEW_MIN_DATE), REVIEW_MAX_DATE)
+    start, end, unit = review_period(period, anchor)
+    summary = review_summary(db_session, start, end, unit)
+    buckets = []
+    day = start
+    while day < end:
+        buckets.append(day)
+        day = (day.replace(day=28) + timedelta(days=4)).replace(day=1) if unit == 'month' else day + timedelta(days=1)
+    labels = [day.strftime(REVIEW_LABELS[period]) for day in buckets]
+    data = [summary['completed'].get(day, 0) for day in buckets]
+    hours = [round(summary['hours'].get(day, 0.0), 2) for day in buckets]
+    # Тепловая карта года выбранного периода: один GROUP BY по дням этого года
+    year = anchor.year
+    counts = heatmap_cache.get(year)
+    if counts is None:
+        counts = completions_by(db_session, 'day', date(year, 1, 1), date(year + 1, 1, 1))
+        heatmap_cache.set(year, counts)
+    heatmap = _heatmap_weeks(year, counts)
+    nav = {'prev': (start - timedelta(days=1)).isoformat(), 'next': end.isoformat(), 'period': period,
+           'start': start, 'last': end - timedelta(days=1)}
+    return render_template('review.html', labels=labels, data=data, hours=hours, total_completed=sum(data),
+                           total_hours=round(sum(hours), 2), projects=summary['projects'], heatmap=heatmap,
+                           heatmap_year=year, nav=nav, nav_data=get_nav_data())
 
 @app.route('/analytics')
 def analytics_page():
-    activities = db.session.execute(select(ActivityLog).order_by(ActivityLog.activity_date)).scalars().all()
-    tasks_time = {}
-    for activity in activities:
-        desc = activity.description
-        if desc not in tasks_time: tasks_time[desc] = []
-        tasks_time[desc].append({'date': activity.activity_date, 'duration': float(activity.duration_hours)})
+    end = _parse_date(request.args.get('end')) or date.today()
+    start = _parse_date(request.args.get('start')) or end - timedelta(days=ANALYTICS_DEFAULT_DAYS)
+    top = max(1, min(request.args.get('top', ANALYTICS_DEFAULT_TOP, type=int), ANALYTICS_MAX_TOP))
+    group = 'project' if request.args.get('group') == 'project' else 'description'
+    filters = {'start': start, 'end': end, 'top': top, 'group': group}
+    dates, series = cumulative_activity(db_session, start, end, top=top, group=group)
+    if not dates: return render_template('analytics.html', labels=[], datasets=[], filters=filters, nav_data=get_nav_data())
     datasets = []
-    all_dates_q = db.session.execute(select(ActivityLog.activity_date).distinct().order_by(ActivityLog.activity_date)).scalars().all()
-    if not all_dates_q: return render_template('analytics.html', labels=[], datasets=[], nav_data=get_nav_data())
-    for task_name, acts in tasks_time.items():
-        cumulative_time, data_points = 0, {}
-        for act in acts:
-            cumulative_time += act['duration']
-            data_points[act['date']] = cumulative_time
-        final_data, last_known_value = [], 0
-        min_date_for_task = min(data_points.keys())
-        for d in all_dates_q:
-            if d in data_points: last_known_value = data_points[d]
-            if d >= min_date_for_task: final_data.append(last_known_value)
-            else: final_data.append(0)
+    for task_name, final_data in series.items():
         datasets.append({'label': task_name, 'data': final_data, 'fill': False, 'tension': 0.1, 'borderColor': f'hsl({(hash(task_name) % 360)}, 70%, 50%)', 'backgroundColor': f'hsla({(hash(task_name) % 360)}, 70%, 50%, 0.1)'})
-    labels = [d.strftime('%d.%m') for d in all_dates_q]
-    return render_template('analytics.html', labels=labels, datasets=datasets, nav_data=get_nav_data())
+    labels = [d.strftime('%d.%m') for d in dates]
+    return render_template('analytics.html', labels=labels, datasets=datasets, filters=filters, nav_data=get_nav_data())
+
+@app.route('/api/suggest')
+def suggest():
+    prefix = request.args.get('q', '').strip().lstrip('#')
+    limit = max(1, min(request.args.get('limit', SUGGEST_LIMIT, type=int), SUGGEST_MAX_LIMIT))
+    if request.args.get('kind') == 'projects': suggestions = suggest_project_names(db_session, prefix, limit)
+    else: suggestions = suggest_task_titles(db_session, prefix, limit)
+    return jsonify(suggestions=suggestions)
+
+@app.route('/api/tasks/bulk', methods=['POST'])
+def bulk_add_tasks():
+    # JSON {"tasks": [{"title", "project", "deadline"}, ...]} или {"text": "..."}, либо просто текст по строке на задачу
+    payload = request.get_json(silent=True)
+    if payload is not None and not isinstance(payload, (dict, str)): return jsonify(error='Ожидается JSON-объект или текст'), 400
+    if isinstance(payload, dict) and isinstance(payload.get('tasks'), list):
+        items = [{'title': str(t.get('title') or '').strip(), 'project': str(t.get('project') or '').strip().lstrip('#') or None,
+                  'deadline': _parse_date(t.get('deadline'))} for t in payload['tasks'] if isinstance(t, dict)]
+        items = [item for item in items if item['title']]
+    else:
+        if isinstance(payload, dict): text = str(payload.get('text') or '')
+        elif isinstance(payload, str): text = payload
+        else: text = request.form.get('text') or request.get_data(as_text=True)
+        items = parse_text(text)
+    if not items: return jsonify(error='Нет задач для добавления'), 400
+    if len(items) > MAX_BULK_TASKS: return jsonify(error=f'Не больше {MAX_BULK_TASKS} задач за раз'), 413
+    ids, unknown_projects = bulk_create_tasks(db_session, items)
+    db_session.commit()
+    return jsonify(created=len(ids), ids=ids, unknown_projects=unknown_projects), 201
+
+# --- API изменения задач: в ответе только измененные строки (JSON + фрагмент HTML) и счетчики ---
+
+def _task_payload(task, view):
+    data = {'id': task.id, 'title': task.title, 'status': task.status, 'is_today': task.is_today, 'priority': task.priority,
+            'deadline': task.deadline.isoformat() if task.deadline else None, 'project_id': task.project_id,
+            'completed_at': task.completed_at.isoformat() if task.completed_at else None}
+    # Фрагмент строки для страницы, с которой пришел запрос; None - строку нужно убрать
+    visible = task.status == 'pending' and (view != 'today' or task.is_today)
+    data['html'] = render_template('_task_row.html', task=task, view=view, today_date=date.today()) if visible else None
+    return data
+
+def _mutation_response(tasks=(), deleted=(), missing=(), status=200):
+    view = 'project' if request.args.get('view') == 'project' else 'today'
+    # Сериализуем до коммита: после него атрибуты задач пришлось бы перечитывать из базы
+    payload = [_task_payload(task, view) for task in tasks]
+    db_session.commit()
+    return jsonify(tasks=payload, deleted=list(deleted), missing=list(missing), counters=read_counters(db_session)), status
+
+@app.route('/api/tasks', methods=['POST'])
+def create_task_api():
+    # JSON {"title", "deadline": "YYYY-MM-DD", "project": "имя", "is_today"}; без проекта задача идет в план на сегодня
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict): return jsonify(error='Ожидается JSON-объект'), 400
+    title = str(payload.get('title') or '').strip()
+    if not title: return jsonify(error='Пустое название задачи'), 400
+    deadline = _parse_date(payload.get('deadline')) if payload.get('deadline') else None
+    if payload.get('deadline') and deadline is None: return jsonify(error='Дата должна быть в формате YYYY-MM-DD'), 400
+    project_name = str(payload.get('project') or '').strip().lstrip('#') or None
+    project_id = project_id_by_name(db_session, project_name) if project_name else None
+    if project_name and project_id is None: return jsonify(error=f'Проект {project_name!r} не найден'), 404
+    task = Task(title=title, deadline=deadline, project_id=project_id, is_today=bool(payload.get('is_today', project_id is None)))
+    db_session.add(task)
+    db_session.flush()
+    return _mutation_response([task], status=201)
+
+@app.route('/api/tasks/<int:task_id>/<action>', methods=['POST'])
+def task_action_api(task_id, action):
+    if action not in TASK_ACTIONS: abort(404)
+    result, missing = apply_task_action(db_session, action, [task_id])
+    if missing: return jsonify(error='Задача не найдена', missing=missing), 404
+    if action == 'delete': return _mutation_response(deleted=result)
+    return _mutation_response(result)
+
+@app.route('/api/tasks/batch', methods=['POST'])
+def batch_tasks_api():
+    # JSON {"action": "complete" | "move_to_today" | "priority" | "delete", "ids": [1, 2, ...]} - одна транзакция
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict) or payload.get('action') not in TASK_ACTIONS:
+        return jsonify(error=f"Укажите action: {', '.join(TASK_ACTIONS)}"), 400
+    ids = payload.get('ids')
+    if not isinstance(ids, list) or not ids or not all(isinstance(i, int) and not isinstance(i, bool) for i in ids):
+        return jsonify(error='ids - непустой список id задач'), 400
+    if len(ids) > MAX_BATCH_TASKS: return jsonify(error=f'Не больше {MAX_BATCH_TASKS} задач за раз'), 413
+    result, missing = apply_task_action(db_session, payload['action'], ids)
+    if payload['action'] == 'delete': return _mutation_response(deleted=result, missing=missing)
+    return _mutation_response(result, missing=missing)
 
 @app.route('/add_task', methods=['POST'])
 def add_task():
@@ -128,32 +296,32 @@ def add_task():
     deadline_str = request.form.get('deadline')
     deadline = datetime.strptime(deadline_str, '%Y-%m-%d').date() if deadline_str else None
     new_task = Task(title=title, deadline=deadline, project_id=None, is_today=True)
-    db.session.add(new_task)
-    db.session.commit()
+    db_session.add(new_task)
+    db_session.commit()
     return redirect(url_for('index'))
     
 @app.route('/add_project', methods=['POST'])
 def add_project():
     project_name = request.form.get('project_name', '').strip()
     if not project_name: return redirect(url_for('projects_page'))
-    exists = db.session.execute(select(Project).filter_by(name=project_name)).first()
-    if not exists:
+    if project_id_by_name(db_session, project_name) is None:
         new_project = Project(name=project_name)
-        db.session.add(new_project)
-        db.session.add(Task(title="Начать работу над проектом", project=new_project))
-        db.session.commit()
+        db_session.add(new_project)
+        db_session.add(Task(title="Начать работу над проектом", project=new_project))
+        db_session.commit()
     return redirect(url_for('projects_page'))
 
 @app.route('/add_task_to_project/<project_name>', methods=['POST'])
 def add_task_to_project(project_name):
     title = request.form.get('title', '').strip()
     if not title: return redirect(url_for('project_detail_page', project_name=project_name))
-    project = db.session.execute(select(Project).filter_by(name=project_name)).scalar_one()
+    project_id = project_id_by_name(db_session, project_name)
+    if project_id is None: abort(404)
     deadline_str = request.form.get('deadline')
     deadline = datetime.strptime(deadline_str, '%Y-%m-%d').date() if deadline_str else None
-    new_task = Task(title=title, deadline=deadline, project_id=project.id)
-    db.session.add(new_task)
-    db.session.commit()
+    new_task = Task(title=title, deadline=deadline, project_id=project_id)
+    db_session.add(new_task)
+    db_session.commit()
     return redirect(url_for('project_detail_page', project_name=project_name))
 
 @app.route('/log_activity', methods=['POST'])
@@ -162,49 +330,34 @@ def log_activity():
     duration_str = request.form.get('duration')
     project_name = request.form.get('project', '').strip().lstrip('#')
     if not (description and duration_str): return redirect(url_for('index'))
-    project_id = None
-    if project_name:
-        project = db.session.execute(select(Project).filter_by(name=project_name)).scalar_one_or_none()
-        if project: project_id = project.id
+    project_id = project_id_by_name(db_session, project_name) if project_name else None
     new_activity = ActivityLog(description=description, duration_hours=float(duration_str), activity_date=date.today(), project_id=project_id)
-    db.session.add(new_activity)
-    db.session.commit()
+    record_activity(db_session, new_activity)
+    db_session.commit()
     return redirect(url_for('index'))
 
 @app.route('/complete_task/<int:task_id>', methods=['POST'])
 def complete_task(task_id):
-    task = db.session.get(Task, task_id)
-    if task:
-        task.status = 'completed'; task.completed_at = datetime.utcnow(); task.is_today = False
-        db.session.commit()
+    apply_task_action(db_session, 'complete', [task_id])
+    db_session.commit()
     return redirect(request.referrer or url_for('index'))
 
 @app.route('/delete_task/<int:task_id>', methods=['POST'])
 def delete_task(task_id):
-    task = db.session.get(Task, task_id)
-    if task:
-        db.session.delete(task)
-        db.session.commit()
+    apply_task_action(db_session, 'delete', [task_id])
+    db_session.commit()
     return redirect(request.referrer or url_for('index'))
 
 @app.route('/move_to_today/<int:task_id>', methods=['POST'])
 def move_to_today(task_id):
-    task = db.session.get(Task, task_id)
-    if task:
-        task.is_today = True
-        db.session.commit()
+    apply_task_action(db_session, 'move_to_today', [task_id])
+    db_session.commit()
     return redirect(request.referrer or url_for('index'))
 
 @app.route('/set_priority/<int:task_id>', methods=['POST'])
 def set_priority(task_id):
-    task = db.session.get(Task, task_id)
-    if task:
-        priorities = ["low", "medium", "high"]
-        current_priority = task.priority or 'low'
-        current_index = priorities.index(current_priority)
-        new_index = (current_index + 1) % len(priorities)
-        task.priority = priorities[new_index]
-        db.session.commit()
+    apply_task_action(db_session, 'priority', [task_id])
+    db_session.commit()
     return redirect(url_for('index'))
 
 if __name__ == '__main__':
@@ -1,10 +1,15 @@
 # bot.py
+import asyncio
+import contextvars
+import html
 import logging
 import os
 import re
+from concurrent.futures import ThreadPoolExecutor
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import (
     Application,
+    BaseUpdateProcessor,
     CommandHandler,
     ContextTypes,
     ConversationHandler,
@@ -15,83 +20,217 @@ from telegram.ext import (
 from sqlalchemy import func
 
 # --- 1. ИМПОРТ ИЗ НАШЕГО ФАЙЛА DATABASE.PY ---
-from database import SessionLocal, Project, Task
+from database import engine, SessionLocal, Task
+from queries import project_stats, project_directory, project_page, deletable_task_page
+from capture import MAX_BULK_TASKS, parse_text, bulk_create_tasks
+from search import SEARCH_PAGE_SIZE, search
+from metrics import instrument_handler, serve_metrics
+from cache import enable_cross_process_invalidation
 
 # --- 2. КОНФИГУРАЦИЯ БОТА ---
 BOT_TOKEN = os.environ.get('BOT_TOKEN')
+# Сколько запросов к БД бот выполняет одновременно (0 - прямо в event loop, как раньше)
+BOT_DB_WORKERS = int(os.environ.get('BOT_DB_WORKERS', 4))
+# Сколько апдейтов Telegram обрабатываются параллельно
+BOT_CONCURRENT_UPDATES = int(os.environ.get('BOT_CONCURRENT_UPDATES', 32))
+# Порт для /metrics в формате Prometheus (не задан - метрики не отдаются)
+BOT_METRICS_PORT = os.environ.get('BOT_METRICS_PORT')
 logging.basicConfig(format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", level=logging.INFO)
 
 # --- 3. НОВИНКА: Определяем состояния для нашего диалога ---
 # Это как "шаги" в нашем разговоре с пользователем
-GET_TITLE, CHOOSE_PROJECT = range(2)
+GET_TITLE, CHOOSE_PROJECT, GET_BULK = range(3)
+
+
+# --- 3.1. НЕБЛОКИРУЮЩИЙ ДОСТУП К БД ---
+# SQLAlchemy синхронная, поэтому каждый запрос уходит в ограниченный пул потоков
+# со своей сессией, а event loop тем временем обслуживает другие чаты.
+
+_db_executor = None
+
+def set_db_workers(workers: int) -> None:
+    global _db_executor
+    if _db_executor is not None:
+        _db_executor.shutdown(wait=True)
+    _db_executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='bot-db') if workers > 0 else None
+
+set_db_workers(BOT_DB_WORKERS)
+# Справочник проектов кэшируется и сбрасывается по NOTIFY при изменениях с сайта
+enable_cross_process_invalidation(engine)
+
+def _with_session(fn, *args):
+    session = SessionLocal()
+    try:
+        return fn(session, *args)
+    finally:
+        session.close()
+
+async def run_db(fn, *args):
+    """Вызывает fn(session, *args) в пуле потоков и возвращает результат."""
+    if _db_executor is None:
+        return _with_session(fn, *args)
+    loop = asyncio.get_running_loop()
+    # Копия контекста нужна, чтобы SQL из потока засчитывался текущему апдейту (metrics)
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(_db_executor, context.run, _with_session, fn, *args)
+
+# Функции ниже выполняются в потоках пула и возвращают обычные значения, а не ORM-объекты,
+# потому что сессия закрывается раньше, чем обработчик ими воспользуется.
+
+def _today_titles(session):
+    return [title for (title,) in session.query(Task.title).filter_by(status='pending', is_today=True).order_by(Task.created_at)]
+
+def _create_task(session, title, project_id):
+    # Возвращает имя проекта ('' для "Плана на сегодня") или None, если проекта уже нет
+    if project_id is None:
+        session.add(Task(title=title, project_id=None, is_today=True))
+        session.commit()
+        return ''
+    project_name = project_directory(session).name_by_id.get(project_id)
+    if project_name is None:
+        return None
+    session.add(Task(title=title, project_id=project_id, is_today=False))
+    session.commit()
+    return project_name
+
+def _delete_task(session, task_id):
+    task = session.get(Task, task_id)
+    if not task:
+        return None
+    task_title = task.title
+    session.delete(task)
+    session.commit()
+    return task_title
+
+def _bulk_create(session, items):
+    ids, unknown_projects = bulk_create_tasks(session, items)
+    session.commit()
+    return len(ids), unknown_projects
+
+# Кнопки "Назад"/"Дальше" для постраничных клавиатур: callback_data вида "<prefix>:prev|next:<курсор>"
+
+def _page_buttons(prefix, prev_cursor, next_cursor):
+    row = []
+    if prev_cursor: row.append(InlineKeyboardButton("◀️ Назад", callback_data=f'{prefix}:prev:{prev_cursor}'))
+    if next_cursor: row.append(InlineKeyboardButton("Дальше ▶️", callback_data=f'{prefix}:next:{next_cursor}'))
+    return [row] if row else []
+
+def _page_cursor(data):
+    """'<prefix>:next:<курсор>' -> (after, before)"""
+    _, direction, cursor = data.split(':', 2)
+    return (cursor, None) if direction == 'next' else (None, cursor)
+
+
+# --- 3.2. ПАРАЛЛЕЛЬНО ПО ЧАТАМ, ПО ОЧЕРЕДИ ВНУТРИ ЧАТА ---
+# ConversationHandler рассчитывает, что апдейты обрабатываются по одному: название задачи,
+# присланное сразу после /newtask, не должно обогнать сам /newtask. Поэтому апдейты одного чата
+# ждут друг друга, а разные чаты по-прежнему обрабатываются параллельно (до BOT_CONCURRENT_UPDATES).
+
+class ChatUpdateProcessor(BaseUpdateProcessor):
+    def __init__(self, max_concurrent_updates: int):
+        super().__init__(max_concurrent_updates)
+        self._chat_locks = {}  # chat_id -> [asyncio.Lock, сколько апдейтов его держат или ждут]
+
+    async def process_update(self, update, coroutine) -> None:
+        chat = update.effective_chat if isinstance(update, Update) else None
+        if chat is None:
+            await super().process_update(update, coroutine)
+            return
+        # Очередь чата - до общего семафора: апдейты одного чата не занимают чужие слоты, пока ждут
+        entry = self._chat_locks.setdefault(chat.id, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                await super().process_update(update, coroutine)
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._chat_locks[chat.id]
+
+    async def do_process_update(self, update, coroutine) -> None:
+        await coroutine
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
 
 
 # --- 4. ОБЫЧНЫЕ КОМАНДЫ (почти без изменений) ---
 
+@instrument_handler
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     user = update.effective_user
     await update.message.reply_html(f"Привет, {user.first_name}! Ассистент готов к работе.\n\n"
                                     "<b>Новые команды:</b>\n"
                                     "/newtask - создать задачу в диалоге\n"
-                                    "/deletetask - удалить задачу")
+                                    "/bulk - добавить много задач, по одной на строку\n"
+                                    "/deletetask - удалить задачу\n"
+                                    "/search слова - найти задачи и записи журнала")
 
+@instrument_handler
 async def today_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    session = SessionLocal()
-    try:
-        tasks = session.query(Task).filter_by(status='pending', is_today=True).order_by(Task.created_at).all()
-        if not tasks:
-            await update.message.reply_text("🎯 План на сегодня пуст!")
-            return
-        message = "<b>🎯 План на сегодня:</b>\n\n" + "\n".join([f"• {task.title}" for task in tasks])
-        await update.message.reply_html(message)
-    finally:
-        session.close()
+    titles = await run_db(_today_titles)
+    if not titles:
+        await update.message.reply_text("🎯 План на сегодня пуст!")
+        return
+    message = "<b>🎯 План на сегодня:</b>\n\n" + "\n".join([f"• {title}" for title in titles])
+    await update.message.reply_html(message)
 
+@instrument_handler
 async def projects_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    session = SessionLocal()
-    try:
-        projects = session.query(Project).order_by(Project.name).all()
-        if not projects:
-            await update.message.reply_text("📂 У вас пока нет проектов.")
-            return
-        message = "<b>📂 Ваши проекты:</b>\n\n" + "\n".join([f"• {proj.name}" for proj in projects])
-        await update.message.reply_html(message)
-    finally:
-        session.close()
+    projects = await run_db(project_stats)
+    if not projects:
+        await update.message.reply_text("📂 У вас пока нет проектов.")
+        return
+    message = "<b>📂 Ваши проекты:</b>\n\n" + "\n".join([f"• {proj['name']} — {proj['completed']}/{proj['total']} ({proj['progress']}%)" for proj in projects])
+    await update.message.reply_html(message)
 
 
 # --- 5. НОВЫЙ ДИАЛОГ ДЛЯ СОЗДАНИЯ ЗАДАЧИ ---
 
 # Шаг 1: Пользователь отправляет /newtask
+@instrument_handler
 async def new_task_start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     await update.message.reply_text("Отлично! Введите название новой задачи. (Для отмены введите /cancel)")
     return GET_TITLE # Переходим на следующий шаг - ожидание названия
 
 # Шаг 2: Пользователь вводит название, бот предлагает проекты
+@instrument_handler
 async def get_title(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     task_title = update.message.text
     context.user_data['task_title'] = task_title # Временно сохраняем название
-    
-    session = SessionLocal()
-    try:
-        projects = session.query(Project).order_by(Project.name).all()
-    finally:
-        session.close()
 
+    reply_markup = await _project_keyboard(None, None)
+    await update.message.reply_text(f"Задача: '{task_title}'\n\nКуда ее добавить?", reply_markup=reply_markup)
+
+    return CHOOSE_PROJECT # Переходим на шаг ожидания нажатия кнопки
+
+async def _project_keyboard(after, before):
+    projects, prev_cursor, next_cursor = await run_db(project_page, after, before)
     keyboard = [
         # Первая кнопка - всегда добавить в "План на сегодня" (без проекта)
         [InlineKeyboardButton("🎯 В План на сегодня", callback_data='select_project:today')],
     ]
-    # Добавляем кнопки для каждого проекта
-    for proj in projects:
-        keyboard.append([InlineKeyboardButton(f"📂 {proj.name}", callback_data=f'select_project:{proj.id}')])
-    
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    await update.message.reply_text(f"Задача: '{task_title}'\n\nКуда ее добавить?", reply_markup=reply_markup)
-    
-    return CHOOSE_PROJECT # Переходим на шаг ожидания нажатия кнопки
+    # Кнопки для проектов текущей страницы
+    for project_id, project_name in projects:
+        keyboard.append([InlineKeyboardButton(f"📂 {project_name}", callback_data=f'select_project:{project_id}')])
+    keyboard += _page_buttons('project_page', prev_cursor, next_cursor)
+    return InlineKeyboardMarkup(keyboard)
+
+# Шаг 2.1: Пользователь листает список проектов
+@instrument_handler
+async def project_page_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    query = update.callback_query
+    await query.answer()
+    after, before = _page_cursor(query.data)
+    await query.edit_message_reply_markup(reply_markup=await _project_keyboard(
+        int(after) if after else None, int(before) if before else None))
+    return CHOOSE_PROJECT
 
 # Шаг 3 (обработчик кнопок): Пользователь нажимает кнопку, задача создается
+@instrument_handler
 async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     query = update.callback_query
     await query.answer() # Обязательно "отвечаем" на нажатие
@@ -104,64 +243,96 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         await query.edit_message_text(text="Произошла ошибка, попробуйте снова /newtask")
         return ConversationHandler.END
 
-    session = SessionLocal()
-    try:
-        if value == 'today': # Если нажали "В План на сегодня"
-            new_task = Task(title=task_title, project_id=None, is_today=True)
-            session.add(new_task)
-            session.commit()
-            await query.edit_message_text(text=f"✅ Задача '{task_title}' добавлена в 'План на сегодня'.")
-        else: # Если выбрали конкретный проект
-            project_id = int(value)
-            project = session.query(Project).get(project_id)
-            if project:
-                new_task = Task(title=task_title, project_id=project.id, is_today=False)
-                session.add(new_task)
-                session.commit()
-                await query.edit_message_text(text=f"✅ Задача '{task_title}' добавлена в проект '{project.name}'.")
-            else:
-                await query.edit_message_text(text="Ошибка: проект не найден.")
-    finally:
-        session.close()
+    if value == 'today': # Если нажали "В План на сегодня"
+        await run_db(_create_task, task_title, None)
+        await query.edit_message_text(text=f"✅ Задача '{task_title}' добавлена в 'План на сегодня'.")
+    else: # Если выбрали конкретный проект
+        project_name = await run_db(_create_task, task_title, int(value))
+        if project_name is not None:
+            await query.edit_message_text(text=f"✅ Задача '{task_title}' добавлена в проект '{project_name}'.")
+        else:
+            await query.edit_message_text(text="Ошибка: проект не найден.")
 
     context.user_data.clear() # Очищаем временные данные
     return ConversationHandler.END # Завершаем диалог
 
 # Шаг 4 (отмена): Пользователь вводит /cancel
+@instrument_handler
 async def cancel(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     context.user_data.clear()
     await update.message.reply_text("Действие отменено.")
     return ConversationHandler.END
 
 
+# --- 5.1. МАССОВЫЙ ЗАХВАТ ЗАДАЧ ---
+
+# Пользователь отправляет /bulk - сразу со списком задач или следующим сообщением
+@instrument_handler
+async def bulk_start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    parts = update.message.text.split(maxsplit=1)
+    if len(parts) > 1:
+        return await _save_bulk(update, parts[1])
+    await update.message.reply_text("Пришлите задачи одним сообщением, по одной на строку.\n"
+                                    "В строке можно указать #проект и дедлайн: @завтра, @15.06, @2025-06-15.\n"
+                                    "(Для отмены введите /cancel)")
+    return GET_BULK
+
+@instrument_handler
+async def bulk_receive(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    return await _save_bulk(update, update.message.text)
+
+async def _save_bulk(update: Update, text: str) -> int:
+    items = parse_text(text)
+    if not items:
+        await update.message.reply_text("Не нашел ни одной задачи. Попробуйте снова /bulk")
+        return ConversationHandler.END
+    if len(items) > MAX_BULK_TASKS:
+        await update.message.reply_text(f"За раз можно добавить не больше {MAX_BULK_TASKS} задач.")
+        return ConversationHandler.END
+    created, unknown_projects = await run_db(_bulk_create, items)
+    message = f"✅ Добавлено задач: {created}."
+    if unknown_projects:
+        message += "\nНе найдены проекты (задачи ушли во 'Входящие'): " + ", ".join(unknown_projects)
+    await update.message.reply_text(message)
+    return ConversationHandler.END
+
+
 # --- 6. НОВАЯ ФУНКЦИЯ ИНТЕРАКТИВНОГО УДАЛЕНИЯ ---
 
 # Пользователь отправляет /deletetask
+@instrument_handler
 async def delete_task_start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    session = SessionLocal()
-    try:
-        # Собираем задачи из "Плана на сегодня" и "Входящих"
-        tasks_today = session.query(Task).filter_by(status='pending', is_today=True).all()
-        tasks_inbox = session.query(Task).filter_by(status='pending', is_today=False, project_id=None).all()
-        
-        all_tasks = tasks_today + tasks_inbox
-        
-        if not all_tasks:
-            await update.message.reply_text("Нет задач для удаления в 'Плане на сегодня' или 'Входящих'.")
-            return
+    # Задачи из "Плана на сегодня" и "Входящих", по одной странице за раз
+    reply_markup = await _delete_keyboard(None, None)
+    if reply_markup is None:
+        await update.message.reply_text("Нет задач для удаления в 'Плане на сегодня' или 'Входящих'.")
+        return
+    await update.message.reply_text("Какую задачу вы хотите удалить?", reply_markup=reply_markup)
 
-        keyboard = []
-        for task in all_tasks:
-            # Для каждой задачи создаем кнопку с callback_data вида "delete_task:123"
-            button = InlineKeyboardButton(f"🗑️ {task.title}", callback_data=f'delete_task:{task.id}')
-            keyboard.append([button])
-        
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        await update.message.reply_text("Какую задачу вы хотите удалить?", reply_markup=reply_markup)
-    finally:
-        session.close()
+async def _delete_keyboard(after, before):
+    tasks, prev_cursor, next_cursor = await run_db(deletable_task_page, after, before)
+    if not tasks:
+        return None
+    # Для каждой задачи создаем кнопку с callback_data вида "delete_task:123"
+    keyboard = [[InlineKeyboardButton(f"🗑️ {title}", callback_data=f'delete_task:{task_id}')] for task_id, title, _ in tasks]
+    keyboard += _page_buttons('delete_page', prev_cursor, next_cursor)
+    return InlineKeyboardMarkup(keyboard)
+
+# Пользователь листает список задач для удаления
+@instrument_handler
+async def delete_page_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    query = update.callback_query
+    await query.answer()
+    reply_markup = await _delete_keyboard(*_page_cursor(query.data))
+    if reply_markup is None:
+        reply_markup = await _delete_keyboard(None, None)  # страница опустела - возвращаемся к началу
+    if reply_markup is None:
+        await query.edit_message_text(text="Нет задач для удаления в 'Плане на сегодня' или 'Входящих'.")
+        return
+    await query.edit_message_reply_markup(reply_markup=reply_markup)
 
 # Пользователь нажимает на кнопку "Удалить"
+@instrument_handler
 async def delete_task_confirm(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     query = update.callback_query
     await query.answer()
@@ -169,36 +340,90 @@ async def delete_task_confirm(update: Update, context: ContextTypes.DEFAULT_TYPE
     action, task_id_str = query.data.split(':')
     task_id = int(task_id_str)
     
-    session = SessionLocal()
-    try:
-        task = session.query(Task).get(task_id)
-        if task:
-            task_title = task.title
-            session.delete(task)
-            session.commit()
-            await query.edit_message_text(text=f"✅ Задача '{task_title}' удалена.")
-        else:
-            await query.edit_message_text(text="Задача уже была удалена.")
-    finally:
-        session.close()
+    task_title = await run_db(_delete_task, task_id)
+    if task_title is not None:
+        await query.edit_message_text(text=f"✅ Задача '{task_title}' удалена.")
+    else:
+        await query.edit_message_text(text="Задача уже была удалена.")
+
+
+# --- 6.1. ПОИСК ---
+
+# В сообщении Telegram страница короче, чем на сайте (SEARCH_PAGE_SIZE)
+BOT_SEARCH_PAGE_SIZE = SEARCH_PAGE_SIZE // 2
+
+def _search_page(session, q, page):
+    return search(session, q, page=page, limit=BOT_SEARCH_PAGE_SIZE)
+
+async def _search_reply(q, page):
+    """Текст и клавиатура страницы результатов; номер страницы - курсор кнопок "Назад"/"Дальше"."""
+    rows, has_next = await run_db(_search_page, q, page)
+    if not rows:
+        return f"🔎 По запросу «{html.escape(q)}» ничего не найдено.", None
+    lines = []
+    for row in rows:
+        icon = '⏱️' if row.kind == 'activity' else '✅' if row.status == 'completed' else '☐'
+        project = f"<b>{html.escape(row.project_name)}:</b> " if row.project_name else ''
+        lines.append(f"{icon} {project}{html.escape(row.text)} <i>{row.day:%d.%m.%Y}</i>")
+    message = f"<b>🔎 {html.escape(q)}</b> (стр. {page})\n\n" + "\n".join(lines)
+    keyboard = _page_buttons('search_page', page - 1 if page > 1 else None, page + 1 if has_next else None)
+    return message, InlineKeyboardMarkup(keyboard) if keyboard else None
+
+# Пользователь отправляет /search <слова>
+@instrument_handler
+async def search_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    q = ' '.join(context.args or []).strip()
+    if not q:
+        await update.message.reply_text("Напишите, что найти: /search отчет")
+        return
+    context.user_data['search_query'] = q  # для кнопок "Назад"/"Дальше"
+    message, reply_markup = await _search_reply(q, 1)
+    await update.message.reply_html(message, reply_markup=reply_markup)
+
+# Пользователь листает результаты поиска
+@instrument_handler
+async def search_page_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    query = update.callback_query
+    await query.answer()
+    q = context.user_data.get('search_query')
+    if not q:
+        await query.edit_message_text(text="Поиск устарел, повторите /search")
+        return
+    after, before = _page_cursor(query.data)
+    message, reply_markup = await _search_reply(q, int(after or before))
+    await query.edit_message_text(text=message, parse_mode='HTML', reply_markup=reply_markup)
 
 
 # --- 7. ГЛАВНАЯ ФУНКЦИЯ С НОВЫМИ ОБРАБОТЧИКАМИ ---
-def main() -> None:
-    application = Application.builder().token(BOT_TOKEN).build()
+def build_application(builder, update_processor=None) -> Application:
+    """Приложение со всеми обработчиками; builder уже знает токен или бота (bot_loadtest.py подставляет своего)."""
+    application = builder.concurrent_updates(update_processor or ChatUpdateProcessor(BOT_CONCURRENT_UPDATES)).build()
 
     # Создаем ConversationHandler для диалога добавления задачи
     conv_handler = ConversationHandler(
         entry_points=[CommandHandler("newtask", new_task_start)],
         states={
             GET_TITLE: [MessageHandler(filters.TEXT & ~filters.COMMAND, get_title)],
-            CHOOSE_PROJECT: [CallbackQueryHandler(button_handler, pattern='^select_project:.*')],
+            CHOOSE_PROJECT: [
+                CallbackQueryHandler(button_handler, pattern='^select_project:.*'),
+                CallbackQueryHandler(project_page_handler, pattern='^project_page:.*'),
+            ],
         },
         fallbacks=[CommandHandler("cancel", cancel)],
     )
 
     application.add_handler(conv_handler)
 
+    # Диалог массового добавления задач
+    bulk_handler = ConversationHandler(
+        entry_points=[CommandHandler("bulk", bulk_start)],
+        states={
+            GET_BULK: [MessageHandler(filters.TEXT & ~filters.COMMAND, bulk_receive)],
+        },
+        fallbacks=[CommandHandler("cancel", cancel)],
+    )
+    application.add_handler(bulk_handler)
+
     # Добавляем обычные команды
     application.add_handler(CommandHandler("start", start))
     application.add_handler(CommandHandler("today", today_command))
@@ -207,6 +432,18 @@ def main() -> None:
     # Добавляем обработчики для удаления
     application.add_handler(CommandHandler("deletetask", delete_task_start))
     application.add_handler(CallbackQueryHandler(delete_task_confirm, pattern='^delete_task:.*'))
+    application.add_handler(CallbackQueryHandler(delete_page_handler, pattern='^delete_page:.*'))
+
+    # Поиск
+    application.add_handler(CommandHandler("search", search_command))
+    application.add_handler(CallbackQueryHandler(search_page_handler, pattern='^search_page:.*'))
+    return application
+
+def main() -> None:
+    application = build_application(Application.builder().token(BOT_TOKEN))
+
+    if BOT_METRICS_PORT:
+        serve_metrics(int(BOT_METRICS_PORT))
 
     print("Бот запущен и готов к работе в интерактивном режиме...")
     application.run_polling()
@@ -0,0 +1,184 @@
+# bot_loadtest.py
+# Нагрузочный тест обработчиков бота без Telegram: одновременно "присылаем" много апдейтов
+# и сравниваем пропускную способность и p99 задержки в двух режимах:
+#   до    - запросы к БД выполняются прямо в event loop (BOT_DB_WORKERS=0)
+#   после - запросы уходят в пул потоков bot.run_db
+# Второй тест проводит диалоги /newtask через настоящий Application (ConversationHandler, процессор
+# апдейтов) с подставным ботом вместо Bot API: все пользователи одновременно присылают /newtask,
+# а сразу за ним - название и нажатие кнопки. Считаем, сколько задач дошло до базы:
+#   до    - SimpleUpdateProcessor, апдейты одного чата обгоняют друг друга
+#   после - bot.ChatUpdateProcessor, внутри чата апдейты идут по очереди
+#
+# Использование:
+#   python bot_loadtest.py [--updates 400] [--concurrency 32] [--workers 4] [--db-latency-ms 5] [--network-ms 20] [--dialogs 100]
+# В первом тесте вызываются только читающие обработчики; задачи, созданные диалогами, в конце удаляются.
+
+import argparse
+import asyncio
+import time
+import uuid
+from types import SimpleNamespace
+
+from sqlalchemy import event, func, select
+from telegram import Update, User
+from telegram.ext import Application, ExtBot, SimpleUpdateProcessor
+
+import bot
+from database import engine, SessionLocal, Task
+
+
+class FakeMessage:
+    def __init__(self, text='', network_delay=0.0):
+        self.text = text
+        self._network_delay = network_delay
+
+    async def reply_text(self, *args, **kwargs):
+        await asyncio.sleep(self._network_delay)  # имитация запроса к Bot API
+
+    reply_html = reply_text
+
+
+def make_update(text, network_delay):
+    message = FakeMessage(text, network_delay)
+    return SimpleNamespace(message=message, effective_user=SimpleNamespace(first_name='Load'), callback_query=None)
+
+def make_context():
+    return SimpleNamespace(user_data={})
+
+HANDLERS = [
+    (bot.today_command, '/today'),
+    (bot.projects_command, '/projects'),
+    (bot.get_title, 'Нагрузочная задача'),
+    (bot.delete_task_start, '/deletetask'),
+]
+
+
+def percentile(values, p):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+async def run_load(updates, concurrency, network_delay):
+    semaphore = asyncio.Semaphore(concurrency)  # как concurrent_updates у Application
+    latencies = []
+
+    async def one(i):
+        handler, text = HANDLERS[i % len(HANDLERS)]
+        submitted = time.perf_counter()
+        async with semaphore:
+            await handler(make_update(text, network_delay), make_context())
+        latencies.append(time.perf_counter() - submitted)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(updates)))
+    elapsed = time.perf_counter() - started
+    return updates / elapsed, percentile(latencies, 50), percentile(latencies, 99)
+
+def report(label, result):
+    throughput, p50, p99 = result
+    print(f"{label:<28} {throughput:>10.1f} upd/s   p50 {p50 * 1000:>8.1f} ms   p99 {p99 * 1000:>8.1f} ms")
+
+
+# --- Диалоги через Application ---
+
+class FakeBot(ExtBot):
+    """Бот без сети: методы Bot API, которые вызывают обработчики, только ждут network_delay."""
+    network_delay = 0.0
+
+    async def get_me(self, *args, **kwargs):
+        self._bot_user = User(id=1, first_name='Load', is_bot=True, username='loadtest_bot')
+        return self._bot_user
+
+    async def _fake_call(self, *args, **kwargs):
+        await asyncio.sleep(self.network_delay)
+        return True
+
+    send_message = answer_callback_query = edit_message_text = _fake_call
+
+def dialog_updates(fake_bot, users, run_id):
+    """Апдейты диалогов: каждый пользователь подряд присылает /newtask, название и нажатие "В План на сегодня"."""
+    def message(user, message_id, text, entities=()):
+        return {'message_id': message_id, 'date': int(time.time()), 'text': text, 'entities': list(entities),
+                'chat': {'id': user, 'type': 'private'}, 'from': {'id': user, 'is_bot': False, 'first_name': 'Load'}}
+    users_ids = range(10_000, 10_000 + users)
+    steps = [
+        lambda user: {'message': message(user, 1, '/newtask', [{'type': 'bot_command', 'offset': 0, 'length': 8}])},
+        lambda user: {'message': message(user, 2, f'Диалог {run_id} {user}')},
+        lambda user: {'callback_query': {'id': str(user), 'chat_instance': str(user), 'data': 'select_project:today',
+                                         'from': {'id': user, 'is_bot': False, 'first_name': 'Load'},
+                                         'message': message(user, 3, 'Куда ее добавить?')}},
+    ]
+    update_id = 0
+    for user in users_ids:
+        for step in steps:
+            update_id += 1
+            yield Update.de_json({'update_id': update_id, **step(user)}, fake_bot)
+
+def _dialog_tasks(session, run_id, delete=False):
+    tasks = session.execute(select(Task).where(Task.title.like(f'Диалог {run_id} %'))).scalars().all()
+    if delete:
+        for task in tasks:
+            session.delete(task)  # по одной через ORM, чтобы счетчики навигации остались верными
+        session.commit()
+    return len(tasks)
+
+async def run_dialogs(users, update_processor, network_delay):
+    FakeBot.network_delay = network_delay
+    fake_bot = FakeBot('1:loadtest')
+    application = bot.build_application(Application.builder().bot(fake_bot).updater(None), update_processor)
+    run_id = uuid.uuid4().hex[:8]
+    async with application:
+        await application.start()
+        started = time.perf_counter()
+        for update in dialog_updates(fake_bot, users, run_id):
+            await application.update_queue.put(update)
+        await application.update_queue.join()
+        elapsed = time.perf_counter() - started
+        await application.stop()
+    session = SessionLocal()
+    try:
+        created = _dialog_tasks(session, run_id, delete=True)
+    finally:
+        session.close()
+    return users * 3 / elapsed, created
+
+def report_dialogs(label, users, result):
+    throughput, created = result
+    print(f"{label:<28} {throughput:>10.1f} upd/s   задач создано: {created} из {users}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный тест обработчиков бота")
+    parser.add_argument('--updates', type=int, default=400)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--workers', type=int, default=bot.BOT_DB_WORKERS)
+    parser.add_argument('--db-latency-ms', type=float, default=5.0, help="искусственная задержка каждого SQL-запроса")
+    parser.add_argument('--network-ms', type=float, default=20.0, help="искусственная задержка ответа Bot API")
+    parser.add_argument('--dialogs', type=int, default=100, help="сколько пользователей одновременно проходят /newtask (0 - пропустить)")
+    args = parser.parse_args()
+
+    if args.db_latency_ms > 0:
+        @event.listens_for(engine, 'before_cursor_execute')
+        def _slow_down(conn, cursor, statement, parameters, context, executemany):
+            time.sleep(args.db_latency_ms / 1000)
+
+    network_delay = args.network_ms / 1000
+    print(f"{args.updates} апдейтов, concurrency={args.concurrency}, db-latency={args.db_latency_ms} ms, network={args.network_ms} ms")
+
+    bot.set_db_workers(0)
+    report("до (БД в event loop)", asyncio.run(run_load(args.updates, args.concurrency, network_delay)))
+
+    bot.set_db_workers(args.workers)
+    report(f"после (пул из {args.workers} потоков)", asyncio.run(run_load(args.updates, args.concurrency, network_delay)))
+
+    if args.dialogs > 0:
+        print(f"\n{args.dialogs} диалогов /newtask через Application, concurrency={args.concurrency}")
+        report_dialogs("до (без очереди по чатам)", args.dialogs,
+                       asyncio.run(run_dialogs(args.dialogs, SimpleUpdateProcessor(args.concurrency), network_delay)))
+        report_dialogs("после (очередь по чатам)", args.dialogs,
+                       asyncio.run(run_dialogs(args.dialogs, bot.ChatUpdateProcessor(args.concurrency), network_delay)))
+    bot.set_db_workers(0)
+
+
+if __name__ == "__main__":
+    main()
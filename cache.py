@@ -0,0 +1,232 @@
+# cache.py
+# Небольшие кэши в памяти процесса, которые сами сбрасываются,
+# когда коммитится изменение в связанных с ними таблицах.
+#
+# Внутри процесса изменения ловятся событиями сессии SQLAlchemy. Между процессами
+# (воркеры gunicorn и бот) изменения рассылаются через PostgreSQL NOTIFY: каждая
+# пишущая транзакция сообщает имена измененных таблиц в канал planner_cache,
+# а фоновый поток в каждом процессе слушает этот канал (LISTEN) и чистит свои кэши.
+# У SQLite такого канала нет: там при каждом чтении кэша сверяется время изменения
+# файлов базы (-wal меняется с каждым коммитом любого процесса) и при расхождении
+# сбрасываются все кэши.
+
+import logging
+import os
+import select
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from itertools import chain
+
+from sqlalchemy import event, inspect, text
+from sqlalchemy.orm import Session
+
+NOTIFY_CHANNEL = 'planner_cache'
+
+logger = logging.getLogger(__name__)
+
+_caches_by_table = defaultdict(list)
+
+
+class TableCache:
+    """LRU-кэш, привязанный к таблицам БД: любой коммит в эти таблицы очищает его целиком."""
+
+    def __init__(self, *tables, maxsize=64, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl  # страховка от изменений, о которых этот процесс не узнал
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        for table in tables:
+            _caches_by_table[table].append(self)
+
+    def get(self, key, default=None):
+        _listener.ensure_started()
+        _file_watcher.check()
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            value, stored_at = item
+            if self.ttl is not None and time.monotonic() - stored_at > self.ttl:
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        # Пока слушатель NOTIFY не подключен, чужие изменения до нас не дойдут - не кэшируем
+        if not _listener.ready:
+            return
+        with self._lock:
+            self._data[key] = (value, time.monotonic())
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+def invalidate(*tables):
+    for table in tables:
+        for cache in _caches_by_table.get(table, ()):
+            cache.clear()
+
+def invalidate_all():
+    for caches in _caches_by_table.values():
+        for cache in caches:
+            cache.clear()
+
+
+# --- Межпроцессная рассылка через LISTEN/NOTIFY ---
+
+class _NotifyListener:
+    def __init__(self):
+        self.engine = None
+        self._connected = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self):
+        # Без настроенного движка работаем как обычный локальный кэш (например, в скриптах)
+        return self.engine is None or self._connected.is_set()
+
+    def ensure_started(self):
+        if self.engine is None or self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='cache-listener', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        backoff = 1
+        while True:
+            try:
+                self._listen()
+            except Exception:
+                logger.warning("Слушатель %s отключился, переподключаюсь через %s с", NOTIFY_CHANNEL, backoff, exc_info=True)
+            # Пока соединения нет, уведомления теряются - сбрасываем все, что могло устареть
+            self._connected.clear()
+            invalidate_all()
+            time.sleep(backoff)
+            backoff = min(backoff * 2, 30)
+
+    def _listen(self):
+        raw = self.engine.raw_connection()
+        conn = raw.driver_connection
+        raw.detach()  # соединение живет вне пула все время работы процесса
+        try:
+            conn.autocommit = True
+            conn.cursor().execute(f"LISTEN {NOTIFY_CHANNEL}")
+            invalidate_all()
+            self._connected.set()
+            while True:
+                if select.select([conn], [], [], 60) == ([], [], []):
+                    continue
+                conn.poll()
+                tables = {notify.payload for notify in conn.notifies}
+                conn.notifies.clear()
+                invalidate(*tables)
+        finally:
+            conn.close()
+
+_listener = _NotifyListener()
+
+
+class _SqliteFileWatcher:
+    def __init__(self):
+        self.paths = ()
+        self._signature = None
+
+    def _stat(self):
+        signature = []
+        for path in self.paths:
+            try:
+                st = os.stat(path)
+                signature.append((st.st_mtime_ns, st.st_size))
+            except FileNotFoundError:
+                signature.append(None)
+        # Заголовок индекса WAL в -shm содержит счетчик изменений: ловит и коммиты в пределах одного тика mtime
+        try:
+            with open(self.paths[0] + '-shm', 'rb') as shm:
+                signature.append(shm.read(48))
+        except FileNotFoundError:
+            signature.append(None)
+        return tuple(signature)
+
+    def check(self):
+        if not self.paths:
+            return
+        signature = self._stat()
+        if signature != self._signature:
+            # Изменилось что-то (возможно, наш же коммит) - сбрасываем все, это дешевле точного учета
+            self._signature = signature
+            invalidate_all()
+
+_file_watcher = _SqliteFileWatcher()
+
+def enable_cross_process_invalidation(engine):
+    """Включает сброс кэшей по изменениям из других процессов.
+    PostgreSQL: поток-слушатель NOTIFY запускается лениво, при первом обращении к кэшу.
+    SQLite (файл): сверка времени изменения файлов базы при каждом чтении кэша."""
+    if engine.dialect.name == 'postgresql':
+        _listener.engine = engine
+    elif engine.dialect.name == 'sqlite' and engine.url.database not in (None, '', ':memory:'):
+        database = os.path.abspath(engine.url.database)
+        _file_watcher.paths = (database, database + '-wal')
+
+
+# --- Отслеживание изменений через события сессии SQLAlchemy ---
+# Слушаем сам класс Session, поэтому это работает и для db.session во Flask, и для SessionLocal в боте.
+
+def _changed_tables(session):
+    return session.info.setdefault('changed_tables', set())
+
+def notify(connection, *tables):
+    # NOTIFY транзакционный: другие процессы получат его только после COMMIT
+    if _listener.engine is None:
+        return
+    for table in tables:
+        connection.execute(text("SELECT pg_notify(:channel, :table)"), {'channel': NOTIFY_CHANNEL, 'table': table})
+
+def _notify(session, tables):
+    notified = session.info.setdefault('notified_tables', set())
+    if _listener.engine is not None and tables - notified:
+        notify(session.connection(), *(tables - notified))
+    notified |= tables
+
+def mark_changed(session, *tables):
+    """Для изменений, сделанных в обход ORM (например, session.connection().execute)."""
+    changed = _changed_tables(session)
+    changed.update(tables)
+    _notify(session, changed)
+
+@event.listens_for(Session, 'after_flush')
+def _collect_flushed_tables(session, flush_context):
+    tables = _changed_tables(session)
+    for obj in chain(session.new, session.dirty, session.deleted):
+        tables.add(inspect(obj).mapper.local_table.name)
+    _notify(session, tables)
+
+@event.listens_for(Session, 'do_orm_execute')
+def _collect_bulk_tables(orm_execute_state):
+    # Массовые insert/update/delete идут мимо flush, их таблицу берем из самого выражения
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        tables = _changed_tables(orm_execute_state.session)
+        tables.add(orm_execute_state.statement.table.name)
+        _notify(orm_execute_state.session, tables)
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_committed_tables(session):
+    session.info.pop('notified_tables', None)
+    tables = session.info.pop('changed_tables', None)
+    if tables:
+        invalidate(*tables)
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_rolled_back_tables(session):
+    session.info.pop('notified_tables', None)
+    session.info.pop('changed_tables', None)
@@ -0,0 +1,94 @@
+# capture.py
+# Массовый "захват" задач: разбор многострочного текста и вставка всех задач одной транзакцией.
+#
+# Каждая непустая строка - отдельная задача. В строке можно указать:
+#   #проект                 - добавить в существующий проект (иначе задача попадает во "Входящие")
+#   @2025-05-01, @01.05,
+#   @01.05.2025             - дедлайн
+#   @сегодня, @завтра       - дедлайн относительно текущей даты
+# Например: "Написать отчет #Работа @завтра"
+
+import re
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import insert
+
+from database import Task
+from counters import task_counters, apply_deltas
+from queries import project_directory
+
+MAX_BULK_TASKS = 500
+
+_PROJECT_RE = re.compile(r'(?<!\S)#(\S+)')
+_DATE_RE = re.compile(r'(?<!\S)@(\S+)')
+_DAY_MONTH_RE = re.compile(r'(\d{1,2})\.(\d{1,2})')
+_RELATIVE_DATES = {'сегодня': 0, 'today': 0, 'завтра': 1, 'tomorrow': 1, 'послезавтра': 2}
+
+
+def parse_deadline(token, today):
+    token = token.lower()
+    if token in _RELATIVE_DATES:
+        return today + timedelta(days=_RELATIVE_DATES[token])
+    for fmt in ('%Y-%m-%d', '%d.%m.%Y'):
+        try: return datetime.strptime(token, fmt).date()
+        except ValueError: pass
+    day_month = _DAY_MONTH_RE.fullmatch(token)
+    if not day_month:
+        return None
+    # Без года - ближайшая такая дата, не раньше сегодняшней. Не через strptime: тот подставляет
+    # 1900 год, и 29.02 не разбиралось бы никогда. До следующего 29 февраля - не больше 8 лет
+    day, month = int(day_month.group(1)), int(day_month.group(2))
+    for year in range(today.year, today.year + 9):
+        try: deadline = date(year, month, day)
+        except ValueError: continue
+        if deadline >= today: return deadline
+    return None
+
+def parse_line(line, today):
+    """'Купить билеты #Отпуск @15.06' -> {'title': 'Купить билеты', 'project': 'Отпуск', 'deadline': date(...)}"""
+    item = {'title': line, 'project': None, 'deadline': None}
+    project = _PROJECT_RE.search(line)
+    if project:
+        item['project'] = project.group(1)
+        line = line[:project.start()] + line[project.end():]
+    for match in list(_DATE_RE.finditer(line))[::-1]:
+        deadline = parse_deadline(match.group(1), today)
+        if deadline is not None and item['deadline'] is None:
+            item['deadline'] = deadline
+            line = line[:match.start()] + line[match.end():]
+    item['title'] = ' '.join(line.split())
+    return item
+
+def parse_text(text, today=None):
+    today = today or date.today()
+    items = [parse_line(line.strip().lstrip('-•*').strip(), today) for line in text.splitlines()]
+    return [item for item in items if item['title']]
+
+
+def bulk_create_tasks(session, items, today=None):
+    """
+    Создает задачи одной пакетной вставкой (без коммита).
+    items - словари с ключами title, project (имя или None), deadline (date или None).
+    Возвращает (id созданных задач, имена ненайденных проектов).
+    Задачи с неизвестным проектом попадают во "Входящие", а "#имя" остается в названии.
+    """
+    today = today or date.today()
+    directory = project_directory(session)  # все имена проектов разрешаются одним обращением
+    rows, unknown_projects = [], []
+    deltas = defaultdict(int)
+    for item in items:
+        project_id = directory.id_by_name.get(item['project']) if item.get('project') else None
+        title = item['title']
+        if item.get('project') and project_id is None:
+            unknown_projects.append(item['project'])
+            title = f"{title} #{item['project']}"
+        rows.append({'title': title, 'project_id': project_id, 'deadline': item.get('deadline'), 'is_today': False, 'status': 'pending'})
+        for name in task_counters('pending', False, project_id, item.get('deadline'), today): deltas[name] += 1
+    if not rows:
+        return [], unknown_projects
+    # Одна инструкция INSERT на весь пакет; счетчики навигации обновляем сами, без пересчета
+    stmt = insert(Task).returning(Task.id).execution_options(counters_handled=True, render_nulls=True)
+    ids = session.execute(stmt, rows).scalars().all()
+    apply_deltas(session, deltas, today)
+    return ids, sorted(set(unknown_projects))
@@ -0,0 +1,200 @@
+# counters.py
+# Счетчики для навигации: сколько задач во "Входящих", в "Плане на сегодня" и просроченных.
+# Хранятся в таблице counters и меняются в той же транзакции, что и сами задачи,
+# поэтому любая страница читает их одним запросом по первичному ключу (а чаще из кэша).
+#
+# Проверка и восстановление: python counters.py check | repair
+
+import sys
+from collections import defaultdict
+from datetime import date
+
+from sqlalchemy import event, inspect, select, update, insert, func, case
+from sqlalchemy.orm import Session
+
+from database import SessionLocal, engine, Counter, Task
+from cache import TableCache, mark_changed, enable_cross_process_invalidation
+
+COUNTER_NAMES = ('inbox', 'today', 'overdue')
+
+# ttl: сброс из другого процесса может прийти между чтением и set(), и тогда в кэш попадут старые значения
+_counters_cache = TableCache('counters', maxsize=1, ttl=10)
+
+
+def task_counters(status, is_today, project_id, deadline, today):
+    """В какие счетчики попадает задача с такими полями (None - значение по умолчанию колонки)."""
+    if (status or 'pending') != 'pending':
+        return ()
+    names = []
+    if is_today: names.append('today')
+    elif project_id is None: names.append('inbox')
+    if deadline is not None and deadline < today: names.append('overdue')
+    return names
+
+
+# --- Подсчет с нуля (источник истины) ---
+
+def count_tasks(connection, today):
+    pending = Task.status == 'pending'
+    row = connection.execute(select(
+        func.count(case((pending & Task.is_today.is_(False) & Task.project_id.is_(None), Task.id))),
+        func.count(case((pending & Task.is_today.is_(True), Task.id))),
+        func.count(case((pending & (Task.deadline < today), Task.id))),
+    )).one()
+    return dict(zip(COUNTER_NAMES, row))
+
+def _store(connection, values, today):
+    for name, value in values.items():
+        updated = connection.execute(update(Counter).where(Counter.name == name).values(value=value, as_of=today))
+        if updated.rowcount == 0:
+            connection.execute(insert(Counter).values(name=name, value=value, as_of=today))
+
+def recount(connection, today=None):
+    today = today or date.today()
+    values = count_tasks(connection, today)
+    _store(connection, values, today)
+    return values
+
+def _refresh_overdue(connection, today):
+    # Просроченность меняется со сменой даты без всяких записей - раз в день пересчитываем по индексу deadline
+    overdue = connection.execute(
+        select(func.count(Task.id)).filter(Task.status == 'pending', Task.deadline < today)
+    ).scalar()
+    _store(connection, {'overdue': overdue}, today)
+
+
+# --- Чтение ---
+
+def read_counters(session):
+    """{'inbox': n, 'today': n, 'overdue': n}"""
+    today = date.today()
+    counters = _counters_cache.get(today)
+    if counters is not None:
+        return counters
+    rows = {row.name: row for row in session.execute(select(Counter.name, Counter.value, Counter.as_of))}
+    if set(rows) != set(COUNTER_NAMES) or rows['overdue'].as_of != today:
+        # Отдельная короткая транзакция: GET-запросы свою сессию не коммитят
+        with session.get_bind().begin() as connection:
+            if set(rows) != set(COUNTER_NAMES): counters = recount(connection, today)
+            else:
+                _refresh_overdue(connection, today)
+                counters = dict(connection.execute(select(Counter.name, Counter.value)).all())
+    else:
+        counters = {name: row.value for name, row in rows.items()}
+    _counters_cache.set(today, counters)
+    return counters
+
+
+# --- Поддержка при изменении задач ---
+
+def apply_deltas(session, deltas, today=None):
+    """Прибавляет изменения к счетчикам в текущей транзакции сессии."""
+    today = today or date.today()
+    connection = session.connection()
+    changed = False
+    for name, delta in deltas.items():
+        if not delta:
+            continue
+        stmt = update(Counter).where(Counter.name == name).values(value=Counter.value + delta)
+        if name == 'overdue':
+            # Если overdue посчитан на другую дату, его все равно пересчитают при чтении
+            stmt = stmt.where(Counter.as_of == today)
+        connection.execute(stmt)
+        changed = True
+    if changed:
+        mark_changed(session, 'counters')
+
+_UNKNOWN = object()
+
+def _old_value(state, key):
+    history = state.attrs[key].history
+    if history.deleted: return history.deleted[0]
+    if history.unchanged: return history.unchanged[0]
+    if history.added: return _UNKNOWN  # атрибут был выгружен до изменения
+    return getattr(state.obj(), key)
+
+def _fields(task):
+    # Task(project=...) получает project_id только во время flush, поэтому смотрим и на связь
+    project_ref = task.project_id if task.project_id is not None else task.project
+    return task.status, task.is_today, project_ref, task.deadline
+
+@event.listens_for(Session, 'before_flush')
+def _track_task_changes(session, flush_context, instances):
+    today = date.today()
+    deltas = defaultdict(int)
+    for obj in session.new:
+        if isinstance(obj, Task):
+            for name in task_counters(*_fields(obj), today): deltas[name] += 1
+    for obj in session.deleted:
+        if isinstance(obj, Task):
+            old = [_old_value(inspect(obj), key) for key in ('status', 'is_today', 'project_id', 'deadline')]
+            if _UNKNOWN in old:
+                session.info['recount_counters'] = True; continue
+            for name in task_counters(*old, today): deltas[name] -= 1
+    for obj in session.dirty:
+        if isinstance(obj, Task) and session.is_modified(obj):
+            old = [_old_value(inspect(obj), key) for key in ('status', 'is_today', 'project_id', 'deadline')]
+            if _UNKNOWN in old:
+                session.info['recount_counters'] = True; continue
+            for name in task_counters(*old, today): deltas[name] -= 1
+            for name in task_counters(*_fields(obj), today): deltas[name] += 1
+    if deltas and not session.info.get('recount_counters'):
+        apply_deltas(session, deltas, today)
+
+@event.listens_for(Session, 'after_flush')
+def _recount_if_needed(session, flush_context):
+    if session.info.pop('recount_counters', False):
+        recount(session.connection())
+        mark_changed(session, 'counters')
+
+@event.listens_for(Session, 'do_orm_execute')
+def _recount_after_bulk(orm_execute_state):
+    # Массовые операции над задачами, не сообщившие свои изменения, приводят к полному пересчету.
+    # Код, который сам вызывает apply_deltas, передает execution_options(counters_handled=True).
+    state = orm_execute_state
+    if not (state.is_insert or state.is_update or state.is_delete):
+        return None
+    if state.statement.table.name != Task.__tablename__ or state.execution_options.get('counters_handled'):
+        return None
+    result = state.invoke_statement()
+    recount(state.session.connection())
+    mark_changed(state.session, 'counters')
+    return result
+
+
+# --- Проверка и восстановление ---
+
+def check(session):
+    """Возвращает {имя: (в таблице, на самом деле)} для расходящихся счетчиков."""
+    today = date.today()
+    stored = dict(session.execute(select(Counter.name, Counter.value)).all())
+    actual = count_tasks(session.connection(), today)
+    return {name: (stored.get(name), value) for name, value in actual.items() if stored.get(name) != value}
+
+def repair(session):
+    values = recount(session.connection())
+    mark_changed(session, 'counters')
+    session.commit()
+    return values
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else None
+    if command not in ('check', 'repair'):
+        print("Использование: python counters.py check | repair")
+        sys.exit(1)
+    enable_cross_process_invalidation(engine)  # после repair другие процессы сбросят свои кэши
+    session = SessionLocal()
+    try:
+        mismatches = check(session)
+        if not mismatches:
+            print("✅ Счетчики совпадают с данными.")
+        for name, (stored, actual) in mismatches.items():
+            print(f"⚠️  {name}: в таблице {stored}, на самом деле {actual}")
+        if command == 'repair' and mismatches:
+            session.rollback()
+            print("✅ Счетчики пересчитаны:", repair(session))
+        elif mismatches:
+            sys.exit(1)
+    finally:
+        session.close()
@@ -0,0 +1,246 @@
+# metrics.py
+# Встроенная инструментация: задержки маршрутов сайта и обработчиков бота,
+# число SQL-запросов и суммарное время SQL на каждый запрос/апдейт, журнал медленных запросов.
+# Все отдается в текстовом формате Prometheus (/metrics у сайта, BOT_METRICS_PORT у бота).
+#
+# Настройка через переменные окружения:
+#   SLOW_QUERY_MS=200           - порог для журнала медленных SQL-запросов
+#   METRICS_DEBUG_HEADER=1      - добавлять в ответы сайта заголовки Server-Timing и X-SQL-Queries
+#
+# Счетчики живут в памяти процесса: у каждого воркера gunicorn своя копия.
+
+import contextvars
+import functools
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', 200))
+DEBUG_HEADER = os.environ.get('METRICS_DEBUG_HEADER', '').lower() in ('1', 'true', 'yes')
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+slow_query_log = logging.getLogger('planner.slow_sql')
+
+
+# --- 1. МЕТРИКИ ---
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels) + '}'
+
+class Counter:
+    def __init__(self, name, help_text):
+        self.name, self.help_text = name, help_text
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(key)} {value}")
+        return lines
+
+class Histogram:
+    def __init__(self, name, help_text, buckets=LATENCY_BUCKETS):
+        self.name, self.help_text = name, help_text
+        self.buckets = tuple(buckets)
+        self._series = {}  # labels -> [счетчики по корзинам..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, series):
+                    cumulative += count
+                    lines.append(f"{self.name}_bucket{_format_labels(key + (('le', bound),))} {cumulative}")
+                lines.append(f"{self.name}_bucket{_format_labels(key + (('le', '+Inf'),))} {series[-1]}")
+                lines.append(f"{self.name}_sum{_format_labels(key)} {series[-2]}")
+                lines.append(f"{self.name}_count{_format_labels(key)} {series[-1]}")
+        return lines
+
+REQUEST_LATENCY = Histogram('planner_http_request_duration_seconds', "Длительность обработки HTTP-запроса")
+REQUEST_SQL_COUNT = Histogram('planner_http_request_sql_statements', "Число SQL-запросов на HTTP-запрос", COUNT_BUCKETS)
+REQUEST_SQL_TIME = Histogram('planner_http_request_sql_seconds', "Суммарное время SQL на HTTP-запрос")
+HANDLER_LATENCY = Histogram('planner_bot_handler_duration_seconds', "Длительность обработчика бота")
+HANDLER_SQL_COUNT = Histogram('planner_bot_handler_sql_statements', "Число SQL-запросов на апдейт бота", COUNT_BUCKETS)
+HANDLER_SQL_TIME = Histogram('planner_bot_handler_sql_seconds', "Суммарное время SQL на апдейт бота")
+SLOW_QUERIES = Counter('planner_sql_slow_queries_total', "SQL-запросы дольше порога SLOW_QUERY_MS")
+SQL_STATEMENTS = Counter('planner_sql_statements_total', "Все SQL-запросы процесса")
+
+REGISTRY = [
+    REQUEST_LATENCY, REQUEST_SQL_COUNT, REQUEST_SQL_TIME,
+    HANDLER_LATENCY, HANDLER_SQL_COUNT, HANDLER_SQL_TIME,
+    SQL_STATEMENTS, SLOW_QUERIES,
+]
+
+def render_metrics():
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+# --- 2. УЧЕТ SQL (события всех движков SQLAlchemy, включая database.engine) ---
+
+class QueryStats:
+    __slots__ = ('statements', 'sql_seconds')
+
+    def __init__(self):
+        self.statements = 0
+        self.sql_seconds = 0.0
+
+_current_stats = contextvars.ContextVar('planner_query_stats', default=None)
+
+@contextmanager
+def track_queries():
+    """Считает SQL-запросы внутри блока (и в потоках, запущенных с копией контекста)."""
+    stats = QueryStats()
+    token = _current_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_stats.reset(token)
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started_at', []).append(time.perf_counter())
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_started_at'].pop()
+    SQL_STATEMENTS.inc()
+    stats = _current_stats.get()
+    if stats is not None:
+        stats.statements += 1
+        stats.sql_seconds += elapsed
+    if elapsed * 1000 >= SLOW_QUERY_MS:
+        SLOW_QUERIES.inc()
+        slow_query_log.warning("Медленный SQL-запрос (%.1f мс): %s", elapsed * 1000, ' '.join(statement.split()))
+
+
+# --- 3. САЙТ (Flask) ---
+
+def init_app(app):
+    from flask import Response, g, request
+
+    @app.before_request
+    def _start_request_metrics():
+        g.metrics_started_at = time.perf_counter()
+        g.metrics_stats = QueryStats()
+        g.metrics_token = _current_stats.set(g.metrics_stats)
+
+    def _observe(started_at, stats, status, labels):
+        elapsed = time.perf_counter() - started_at
+        REQUEST_LATENCY.observe(elapsed, status=status, **labels)
+        REQUEST_SQL_COUNT.observe(stats.statements, **labels)
+        REQUEST_SQL_TIME.observe(stats.sql_seconds, **labels)
+        return elapsed
+
+    @app.after_request
+    def _finish_request_metrics(response):
+        started_at = g.pop('metrics_started_at', None)
+        if started_at is None:
+            return response
+        stats = g.pop('metrics_stats')
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        labels = {'route': route, 'method': request.method}
+        if response.is_streamed:
+            # Тело потоковых ответов (/archive?all=1, /export/...) читается из курсора уже после after_request:
+            # задержку и SQL записываем, когда ответ отдан целиком. Заголовки к этому времени уже отправлены
+            g.metrics_streaming = True
+            response.call_on_close(lambda: _observe(started_at, stats, response.status_code, labels))
+            return response
+        elapsed = _observe(started_at, stats, response.status_code, labels)
+        if DEBUG_HEADER:
+            response.headers['X-SQL-Queries'] = str(stats.statements)
+            response.headers['Server-Timing'] = (
+                f'app;dur={elapsed * 1000:.1f}, sql;dur={stats.sql_seconds * 1000:.1f};desc="{stats.statements} queries"'
+            )
+        return response
+
+    @app.teardown_request
+    def _reset_request_metrics(exc):
+        # stream_with_context вызывает teardown дважды: когда view вернул ответ и когда поток закончился.
+        # SQL потока должен считаться в тот же запрос, поэтому счетчик снимаем только во второй раз
+        if g.pop('metrics_streaming', False):
+            return
+        token = g.pop('metrics_token', None)
+        if token is not None:
+            _current_stats.reset(token)
+
+    @app.route('/metrics')
+    def metrics():
+        return Response(render_metrics(), mimetype=CONTENT_TYPE)
+
+
+# --- 4. БОТ ---
+
+def instrument_handler(handler):
+    """Декоратор для async-обработчиков бота: задержка и SQL на каждый апдейт."""
+    @functools.wraps(handler)
+    async def wrapper(*args, **kwargs):
+        started_at = time.perf_counter()
+        with track_queries() as stats:
+            try:
+                return await handler(*args, **kwargs)
+            finally:
+                name = handler.__name__
+                HANDLER_LATENCY.observe(time.perf_counter() - started_at, handler=name)
+                HANDLER_SQL_COUNT.observe(stats.statements, handler=name)
+                HANDLER_SQL_TIME.observe(stats.sql_seconds, handler=name)
+    return wrapper
+
+class _MetricsRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = render_metrics().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def serve_metrics(port, host='127.0.0.1'):
+    """Отдает /metrics из фонового потока (для процессов без веб-сервера, например бота)."""
+    server = ThreadingHTTPServer((host, port), _MetricsRequestHandler)
+    threading.Thread(target=server.serve_forever, name='metrics-http', daemon=True).start()
+    return server
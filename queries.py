@@ -0,0 +1,460 @@
+# queries.py
+# Общие запросы к базе данных, которыми пользуются и веб-приложение (app.py), и бот (bot.py).
+# Каждая функция принимает уже открытую сессию и ничего не коммитит.
+
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import select, func, case, tuple_, update, delete, and_, or_, union_all, cast, Date
+
+from database import Project, Task, ArchivedTask, ActivityDaily, ProjectActivityDaily
+from cache import TableCache
+from counters import task_counters, apply_deltas  # импорт counters регистрирует поддержку счетчиков
+
+
+# --- 1. СТАТИСТИКА ПРОЕКТОВ ---
+
+def project_stats(session):
+    """Счетчики задач по всем проектам одним GROUP BY-запросом (вместо N+1 ленивых загрузок).
+    Задачи из архива (tasks_archive) завершены и учитываются в total и completed."""
+    is_completed = Task.status == 'completed'
+    is_pending = Task.status == 'pending'
+    archived = (
+        select(ArchivedTask.project_id, func.count().label('archived'))
+        .group_by(ArchivedTask.project_id).subquery()
+    )
+    archived_count = func.coalesce(func.max(archived.c.archived), 0)
+    stmt = (
+        select(
+            Project.id,
+            Project.name,
+            (func.count(Task.id) + archived_count).label('total'),
+            (func.count(case((is_completed, Task.id))) + archived_count).label('completed'),
+            func.count(case((is_pending, Task.id))).label('pending'),
+            func.count(case((is_pending & Task.is_today.is_(True), Task.id))).label('today'),
+        )
+        .outerjoin(Task, Task.project_id == Project.id)
+        .outerjoin(archived, archived.c.project_id == Project.id)
+        .group_by(Project.id, Project.name)
+        .order_by(Project.name)
+    )
+    stats = []
+    for row in session.execute(stmt):
+        progress = int((row.completed / row.total) * 100) if row.total > 0 else 0
+        stats.append({
+            'id': row.id, 'name': row.name, 'total': row.total, 'completed': row.completed,
+            'pending': row.pending, 'today': row.today, 'progress': progress,
+        })
+    return stats
+
+
+# --- 2. КАЛЕНДАРЬ ---
+
+def tasks_by_deadline(session, start, end):
+    """Задачи (и из архива) с дедлайном в диапазоне [start, end], сгруппированные по дате в формате ISO."""
+    parts = [
+        select(model.id, model.title, model.status, model.deadline).filter(model.deadline >= start, model.deadline <= end)
+        for model in (Task, ArchivedTask)
+    ]
+    tasks = union_all(*parts).subquery()
+    stmt = select(tasks).order_by(tasks.c.deadline, tasks.c.id)
+    tasks_by_date = {}
+    for task in session.execute(stmt):
+        tasks_by_date.setdefault(task.deadline.isoformat(), []).append(task)
+    return tasks_by_date
+
+
+# --- 3. ЖУРНАЛ АКТИВНОСТИ И АНАЛИТИКА ---
+
+def _insert_for(session, model):
+    # INSERT ... ON CONFLICT есть только в диалектных конструкциях
+    if session.get_bind().dialect.name == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        from sqlalchemy.dialects.postgresql import insert
+    return insert(model)
+
+def _add_hours(session, model, keys, hours):
+    stmt = _insert_for(session, model).values(**keys, hours=hours)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=list(keys),
+        set_={'hours': model.hours + stmt.excluded.hours},
+    )
+    session.execute(stmt)
+
+def record_activity(session, activity):
+    """Добавляет запись журнала и в той же транзакции обновляет дневные сводки."""
+    session.add(activity)
+    _add_hours(session, ActivityDaily, {'activity_date': activity.activity_date, 'description': activity.description}, activity.duration_hours)
+    if activity.project_id is not None:
+        _add_hours(session, ProjectActivityDaily, {'activity_date': activity.activity_date, 'project_id': activity.project_id}, activity.duration_hours)
+
+def cumulative_activity(session, start, end, top=10, group='description'):
+    """
+    Накопленные часы по дням для top самых затратных описаний (или проектов) за период [start, end].
+    Возвращает (даты, {название: [значения по датам]}). Накопление считает оконная функция в SQL,
+    а часы до начала периода добавляются одним GROUP BY, поэтому объем работы зависит только от периода.
+    """
+    if group == 'project':
+        model, key = ProjectActivityDaily, ProjectActivityDaily.project_id
+    else:
+        model, key = ActivityDaily, ActivityDaily.description
+    in_range = (model.activity_date >= start) & (model.activity_date <= end)
+
+    top_keys = session.execute(
+        select(key).filter(in_range).group_by(key).order_by(func.sum(model.hours).desc()).limit(top)
+    ).scalars().all()
+    labels = session.execute(select(model.activity_date).filter(in_range).distinct().order_by(model.activity_date)).scalars().all()
+    if not top_keys or not labels:
+        return [], {}
+
+    baseline = dict(session.execute(
+        select(key, func.sum(model.hours)).filter(key.in_(top_keys), model.activity_date < start).group_by(key)
+    ).all())
+    running = func.sum(model.hours).over(partition_by=key, order_by=model.activity_date)
+    rows = session.execute(
+        select(key, model.activity_date, running).filter(key.in_(top_keys), in_range)
+    ).all()
+
+    cumulative = {k: {} for k in top_keys}
+    for k, day, value in rows:
+        cumulative[k][day] = float(value + (baseline.get(k) or 0))
+
+    series = {}
+    for k in top_keys:
+        last_known = float(baseline.get(k) or 0)
+        values = []
+        for day in labels:
+            last_known = cumulative[k].get(day, last_known)
+            values.append(last_known)
+        series[k] = values
+
+    if group == 'project':
+        names = dict(session.execute(select(Project.id, Project.name).filter(Project.id.in_(top_keys))).all())
+        series = {names.get(k, str(k)): v for k, v in series.items()}
+    return labels, series
+
+
+# --- 4. АРХИВ (keyset-пагинация по (completed_at, id)) ---
+# Завершенные задачи лежат в двух таблицах: недавние - в tasks, старые - в tasks_archive
+# (см. retention.py). Фильтры, граница страницы и LIMIT применяются в каждой таблице отдельно
+# (у обеих есть индекс (completed_at, id)), а затем не больше 2 * (limit + 1) строк сливаются.
+
+ARCHIVE_PAGE_SIZE = 50
+
+def encode_cursor(row):
+    return f"{row.completed_at.isoformat()}_{row.id}"
+
+def decode_cursor(cursor):
+    try:
+        completed_at, task_id = cursor.rsplit('_', 1)
+        return datetime.fromisoformat(completed_at), int(task_id)
+    except (AttributeError, ValueError):
+        return None
+
+def _archive_query(start=None, end=None, project_name=None, newer_than=None, older_than=None, limit=None):
+    # Только нужные колонки и имя проекта через JOIN: без ORM-объектов и ленивой загрузки task.project
+    ascending = newer_than is not None
+    parts = []
+    for model, condition in ((Task, Task.status == 'completed'), (ArchivedTask, None)):
+        key = tuple_(model.completed_at, model.id)
+        stmt = select(model.id, model.title, model.completed_at, model.project_id).filter(model.completed_at != None)
+        if condition is not None: stmt = stmt.filter(condition)
+        if start: stmt = stmt.filter(model.completed_at >= start)
+        if end: stmt = stmt.filter(model.completed_at < end + timedelta(days=1))
+        if project_name: stmt = stmt.filter(model.project_id == select(Project.id).filter(Project.name == project_name).scalar_subquery())
+        if newer_than: stmt = stmt.filter(key > tuple_(*newer_than))
+        if older_than: stmt = stmt.filter(key < tuple_(*older_than))
+        if limit is not None:
+            order = (model.completed_at, model.id) if ascending else (model.completed_at.desc(), model.id.desc())
+            stmt = select(stmt.order_by(*order).limit(limit).subquery())
+        parts.append(stmt)
+    tasks = union_all(*parts).subquery('completed_tasks')
+    order = (tasks.c.completed_at, tasks.c.id) if ascending else (tasks.c.completed_at.desc(), tasks.c.id.desc())
+    stmt = (
+        select(tasks.c.id, tasks.c.title, tasks.c.completed_at, Project.name.label('project_name'))
+        .outerjoin(Project, tasks.c.project_id == Project.id)
+        .order_by(*order)
+    )
+    return stmt.limit(limit) if limit is not None else stmt
+
+def archive_rows(session, after=None, before=None, limit=ARCHIVE_PAGE_SIZE, **filters):
+    """
+    Одна страница архива, от новых к старым. after/before - курсоры соседних страниц.
+    Возвращает (строки, есть_ли_более_старые, есть_ли_более_новые).
+    """
+    before_key = decode_cursor(before) if before else None
+    after_key = decode_cursor(after) if after else None
+    if before_key:
+        # Листаем назад: берем ближайшие более новые строки по возрастанию и разворачиваем
+        rows = session.execute(_archive_query(newer_than=before_key, limit=limit + 1, **filters)).all()
+        has_newer = len(rows) > limit
+        return list(reversed(rows[:limit])), True, has_newer
+    rows = session.execute(_archive_query(older_than=after_key, limit=limit + 1, **filters)).all()
+    return rows[:limit], len(rows) > limit, after_key is not None
+
+def iter_archive(session, batch_size=500, **filters):
+    """Весь архив потоком: серверный курсор отдает строки пачками по batch_size."""
+    yield from session.execute(_archive_query(**filters).execution_options(yield_per=batch_size))
+
+
+# --- 5. АВТОДОПОЛНЕНИЕ ---
+
+SUGGEST_LIMIT = 10
+
+def _prefix_pattern(prefix):
+    # Экранируем спецсимволы LIKE, чтобы "%" или "_" во вводе искались буквально
+    escaped = prefix.lower().replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return escaped + '%'
+
+def _prefix_filter(dialect, column, prefix):
+    lowered = func.lower(column)
+    if dialect == 'sqlite':
+        # SQLite не применяет индекс по выражению к LIKE (и к LIKE с ESCAPE), а к диапазону - применяет:
+        # все строки с началом "отч" лежат в [отч, отш)
+        prefix = prefix.lower()
+        return and_(lowered >= prefix, lowered < prefix[:-1] + chr(ord(prefix[-1]) + 1))
+    return lowered.like(_prefix_pattern(prefix), escape='\\')
+
+def suggest_task_titles(session, prefix, limit=SUGGEST_LIMIT):
+    """Названия задач, начинающиеся с prefix: сначала самые частые, затем самые свежие."""
+    if not prefix: return []
+    stmt = (
+        select(Task.title)
+        .filter(_prefix_filter(session.get_bind().dialect.name, Task.title, prefix))
+        .group_by(Task.title)
+        .order_by(func.count().desc(), func.max(Task.id).desc())
+        .limit(limit)
+    )
+    return session.execute(stmt).scalars().all()
+
+def suggest_project_names(session, prefix, limit=SUGGEST_LIMIT):
+    # Проектов немного, и их список уже лежит в кэше - фильтруем его без запроса к БД
+    if not prefix: return []
+    prefix = prefix.lower()
+    return [name for _, name in project_directory(session).choices if name.lower().startswith(prefix)][:limit]
+
+
+# --- 6. СПРАВОЧНИК ПРОЕКТОВ (общий кэш id <-> имя) ---
+
+class ProjectDirectory:
+    def __init__(self, rows):
+        self.choices = [(project_id, name) for project_id, name in rows]  # отсортированы по имени
+        self.id_by_name = {name: project_id for project_id, name in self.choices}
+        self.name_by_id = {project_id: name for project_id, name in self.choices}
+
+_project_cache = TableCache('projects', maxsize=1, ttl=300)
+
+def project_directory(session):
+    """Все проекты (id, имя); кэшируется и сбрасывается при любом изменении таблицы projects."""
+    directory = _project_cache.get('all')
+    if directory is None:
+        directory = ProjectDirectory(session.execute(select(Project.id, Project.name).order_by(Project.name)).all())
+        _project_cache.set('all', directory)
+    return directory
+
+def project_id_by_name(session, name):
+    return project_directory(session).id_by_name.get(name)
+
+
+# --- 7. ИЗМЕНЕНИЕ ЗАДАЧ (одна задача или пакет id одной инструкцией) ---
+
+TASK_ACTIONS = ('complete', 'move_to_today', 'priority', 'delete')
+PRIORITIES = ("low", "medium", "high")
+MAX_BATCH_TASKS = 500
+
+# Поля задачи после действия в порядке task_counters: (status, is_today, project_id, deadline)
+_FIELDS_AFTER = {
+    'complete': lambda row: ('completed', False, row.project_id, row.deadline),
+    'move_to_today': lambda row: (row.status, True, row.project_id, row.deadline),
+    'priority': lambda row: (row.status, row.is_today, row.project_id, row.deadline),
+}
+
+def _action_values(action):
+    if action == 'complete':
+        return {'status': 'completed', 'completed_at': datetime.utcnow(), 'is_today': False}
+    if action == 'move_to_today':
+        return {'is_today': True}
+    # Следующий приоритет по кругу low -> medium -> high -> low (пустой считается low)
+    return {'priority': case(
+        (or_(Task.priority.is_(None), Task.priority == PRIORITIES[0]), PRIORITIES[1]),
+        (Task.priority == PRIORITIES[1], PRIORITIES[2]),
+        else_=PRIORITIES[0],
+    )}
+
+def apply_task_action(session, action, task_ids, today=None):
+    """
+    Применяет действие ко всем задачам из task_ids одной инструкцией UPDATE или DELETE (без коммита).
+    Возвращает (задачи после изменения, ненайденные id); для delete вместо задач - удаленные id.
+    delete удаляет и задачи из архива (tasks_archive). Счетчики навигации меняются на разницу
+    в той же транзакции, без пересчета.
+    """
+    if action not in TASK_ACTIONS:
+        raise ValueError(f"Неизвестное действие: {action}")
+    today = today or date.today()
+    ids = list(dict.fromkeys(task_ids))
+    # Блокируем строки, чтобы параллельное изменение не сбило вычисленные разницы счетчиков
+    rows = session.execute(
+        select(Task.id, Task.status, Task.is_today, Task.project_id, Task.deadline).where(Task.id.in_(ids)).with_for_update()
+    ).all()
+    found = {row.id for row in rows}
+    missing = [task_id for task_id in ids if task_id not in found]
+    if action == 'delete' and missing:
+        # Архивные задачи завершены и в счетчики не входят
+        archived = set(session.execute(delete(ArchivedTask).where(ArchivedTask.id.in_(missing)).returning(ArchivedTask.id)).scalars())
+        found |= archived
+        missing = [task_id for task_id in missing if task_id not in archived]
+    if not rows:
+        return [task_id for task_id in ids if task_id in found], missing
+    deltas = defaultdict(int)
+    for row in rows:
+        for name in task_counters(row.status, row.is_today, row.project_id, row.deadline, today): deltas[name] -= 1
+        if action != 'delete':
+            for name in task_counters(*_FIELDS_AFTER[action](row), today): deltas[name] += 1
+    where = Task.id.in_([row.id for row in rows])
+    if action == 'delete':
+        session.execute(delete(Task).where(where).execution_options(counters_handled=True))
+        result = [task_id for task_id in ids if task_id in found]
+    else:
+        stmt = update(Task).where(where).values(**_action_values(action)).returning(Task)
+        tasks = {task.id: task for task in session.execute(stmt.execution_options(counters_handled=True)).scalars()}
+        result = [tasks[task_id] for task_id in ids if task_id in tasks]
+    apply_deltas(session, deltas, today)
+    return result, missing
+
+
+# --- 8. СТРАНИЦЫ ДЛЯ INLINE-КЛАВИАТУР БОТА (keyset: LIMIT n по индексу) ---
+# Курсоры короткие, чтобы поместиться в callback_data (не больше 64 байт).
+
+PICKER_PAGE_SIZE = 8
+
+def project_page(session, after=None, before=None, limit=PICKER_PAGE_SIZE):
+    """
+    Страница проектов по имени. after/before - id проекта на границе соседней страницы.
+    Возвращает ([(id, имя)], курсор назад или None, курсор вперед или None).
+    """
+    stmt = select(Project.id, Project.name)
+    if before is not None:
+        bound = select(Project.name).where(Project.id == before).scalar_subquery()
+        rows = session.execute(stmt.where(Project.name < bound).order_by(Project.name.desc()).limit(limit + 1)).all()
+        more = len(rows) > limit
+        rows = rows[:limit][::-1]
+        return rows, (str(rows[0].id) if more else None), (str(rows[-1].id) if rows else None)
+    if after is not None:
+        stmt = stmt.where(Project.name > select(Project.name).where(Project.id == after).scalar_subquery())
+    rows = session.execute(stmt.order_by(Project.name).limit(limit + 1)).all()
+    more = len(rows) > limit
+    rows = rows[:limit]
+    return rows, (str(rows[0].id) if after is not None and rows else None), (str(rows[-1].id) if more else None)
+
+# Задачи, которые бот предлагает удалить: сначала "План на сегодня", затем "Входящие", внутри - по id
+_PICKER_SEGMENTS = (
+    ('t', (Task.status == 'pending') & (Task.is_today == True)),
+    ('i', (Task.status == 'pending') & (Task.is_today == False) & (Task.project_id == None)),
+)
+
+def _decode_picker_cursor(cursor):
+    segment, _, task_id = (cursor or '').partition(':')
+    keys = [key for key, _ in _PICKER_SEGMENTS]
+    if segment not in keys or not task_id.isdigit():
+        return None
+    return keys.index(segment), int(task_id)
+
+def deletable_task_page(session, after=None, before=None, limit=PICKER_PAGE_SIZE):
+    """
+    Страница задач для удаления. Курсоры вида 't:123' / 'i:45' (раздел и id задачи).
+    Возвращает ([(id, название, курсор)], курсор назад или None, курсор вперед или None).
+    """
+    start = _decode_picker_cursor(before if before is not None else after)
+    backward = before is not None and start is not None
+    if backward:
+        segments = range(start[0], -1, -1)
+    else:
+        segments = range(start[0] if start else 0, len(_PICKER_SEGMENTS))
+    rows = []
+    for index in segments:
+        # Не больше двух запросов: страница может начаться в одном разделе и закончиться в следующем
+        key, condition = _PICKER_SEGMENTS[index]
+        stmt = select(Task.id, Task.title).where(condition)
+        if start and index == start[0]:
+            stmt = stmt.where(Task.id < start[1] if backward else Task.id > start[1])
+        stmt = stmt.order_by(Task.id.desc() if backward else Task.id).limit(limit + 1 - len(rows))
+        rows += [(task_id, title, f"{key}:{task_id}") for task_id, title in session.execute(stmt)]
+        if len(rows) > limit:
+            break
+    more = len(rows) > limit
+    rows = rows[:limit]
+    if backward:
+        rows.reverse()
+        return rows, (rows[0][2] if more else None), (rows[-1][2] if rows else None)
+    return rows, (rows[0][2] if start and rows else None), (rows[-1][2] if more else None)
+
+
+# --- 9. РЕВЬЮ ПРОДУКТИВНОСТИ (агрегация в SQL за неделю, месяц или год) ---
+# Выполненные задачи считаются по обеим таблицам (tasks и архиву) через индексы по completed_at,
+# часы - по дневным сводкам журнала. Объем работы зависит только от длины периода.
+
+REVIEW_PERIODS = ('week', 'month', 'year')
+
+def review_period(period, day):
+    """Границы периода, содержащего day: (начало, конец не включительно, шаг графика 'day' | 'month')."""
+    if period == 'year':
+        return date(day.year, 1, 1), date(day.year + 1, 1, 1), 'month'
+    if period == 'month':
+        start = day.replace(day=1)
+        return start, (start.replace(day=28) + timedelta(days=4)).replace(day=1), 'day'
+    start = day - timedelta(days=day.weekday())
+    return start, start + timedelta(days=7), 'day'
+
+def _truncate(session, unit, column):
+    """date_trunc(unit, column)::date; в SQLite - те же значения через date()/strftime()."""
+    if session.get_bind().dialect.name == 'sqlite':
+        if unit == 'day': return func.date(column, type_=Date)
+        return func.strftime('%Y-%m-01', column, type_=Date)
+    return cast(func.date_trunc(unit, column), Date)
+
+def _completed_between(session, unit, start, end):
+    # (день/месяц завершения, project_id) каждой задачи, завершенной в [start, end)
+    parts = []
+    for model, condition in ((Task, Task.status == 'completed'), (ArchivedTask, None)):
+        stmt = select(_truncate(session, unit, model.completed_at).label('bucket'), model.project_id.label('project_id'))
+        stmt = stmt.filter(model.completed_at >= start, model.completed_at < end)
+        if condition is not None: stmt = stmt.filter(condition)
+        parts.append(stmt)
+    return union_all(*parts).subquery('completed')
+
+def completions_by(session, unit, start, end):
+    """{дата начала дня/месяца: число выполненных задач} за [start, end)."""
+    completed = _completed_between(session, unit, start, end)
+    return dict(session.execute(select(completed.c.bucket, func.count()).group_by(completed.c.bucket)).all())
+
+def review_summary(session, start, end, unit='day'):
+    """
+    Итоги за [start, end): выполненные задачи и залогированные часы по дням (или месяцам) и по проектам.
+    Возвращает {'completed': {дата: n}, 'hours': {дата: часы}, 'projects': [{name, completed, hours}]}.
+    """
+    completed = _completed_between(session, unit, start, end)
+    completed_by_project = dict(session.execute(
+        select(completed.c.project_id, func.count()).group_by(completed.c.project_id)
+    ).all())
+    in_range = (ActivityDaily.activity_date >= start) & (ActivityDaily.activity_date < end)
+    bucket = _truncate(session, unit, ActivityDaily.activity_date)
+    hours = {day: float(value) for day, value in session.execute(
+        select(bucket, func.sum(ActivityDaily.hours)).filter(in_range).group_by(bucket)
+    )}
+    hours_by_project = {project_id: float(value) for project_id, value in session.execute(
+        select(ProjectActivityDaily.project_id, func.sum(ProjectActivityDaily.hours))
+        .filter(ProjectActivityDaily.activity_date >= start, ProjectActivityDaily.activity_date < end)
+        .group_by(ProjectActivityDaily.project_id)
+    )}
+    # Часы без проекта в сводку по проектам не попадают: это остаток от общего итога за период
+    unassigned = round(sum(hours.values()) - sum(hours_by_project.values()), 2)
+    if unassigned > 0: hours_by_project[None] = unassigned
+    names = project_directory(session).name_by_id
+    projects = [
+        {'name': names.get(project_id, 'Без проекта') if project_id is not None else 'Без проекта',
+         'completed': completed_by_project.get(project_id, 0), 'hours': hours_by_project.get(project_id, 0.0)}
+        for project_id in set(completed_by_project) | set(hours_by_project)
+    ]
+    projects.sort(key=lambda item: (-item['completed'], -item['hours'], item['name']))
+    return {'completed': completions_by(session, unit, start, end), 'hours': hours, 'projects': projects}
@@ -0,0 +1,183 @@
+# retention.py
+# Разделение горячих и холодных данных.
+#
+# 1. Архив задач: завершенные задачи старше ARCHIVE_AFTER_DAYS переносятся из tasks в tasks_archive
+#    пачками по ARCHIVE_BATCH строк (каждая пачка - своя короткая транзакция). Частые запросы
+#    (дашборд, счетчики, бот) работают только с tasks; /archive, календарь и поиск читают обе таблицы.
+# 2. Журнал активности (PostgreSQL): activity_log секционирован по месяцам activity_date, чтобы
+#    запросы за период читали только свои секции. Секции создаются заранее на PARTITION_MONTHS_AHEAD
+#    месяцев вперед; строки вне готовых секций попадают в activity_log_default и переносятся
+#    в свою секцию при следующем запуске.
+#
+# Использование: python retention.py run | archive [--days N] | partitions
+# Запускается при развертывании (start.sh) и по расписанию, например раз в сутки из cron.
+
+import argparse
+import os
+from datetime import date, datetime, timedelta, timezone
+
+from sqlalchemy import select, insert, delete, text
+from sqlalchemy.schema import CreateTable
+
+from database import engine, SessionLocal, Task, ArchivedTask
+from cache import enable_cross_process_invalidation
+from search import create_search_index
+
+ARCHIVE_AFTER_DAYS = int(os.environ.get('ARCHIVE_AFTER_DAYS', 90))
+ARCHIVE_BATCH = int(os.environ.get('ARCHIVE_BATCH', 5000))
+PARTITION_MONTHS_AHEAD = int(os.environ.get('PARTITION_MONTHS_AHEAD', 3))
+
+_TASK_COLUMNS = ('id', 'title', 'status', 'created_at', 'completed_at', 'is_today', 'priority', 'deadline', 'project_id')
+_ACTIVITY_COLUMNS = 'id, description, duration_hours, activity_date, project_id'
+
+
+# --- 1. АРХИВ ЗАВЕРШЕННЫХ ЗАДАЧ ---
+
+def archive_completed(session, older_than_days=ARCHIVE_AFTER_DAYS, batch_size=ARCHIVE_BATCH, now=None):
+    """Переносит завершенные задачи старше older_than_days дней в tasks_archive. Коммитит каждую пачку.
+    Возвращает число перенесенных задач."""
+    cutoff = (now or datetime.now(timezone.utc)) - timedelta(days=older_than_days)
+    total = 0
+    while True:
+        # Самые старые по индексу (completed_at, id); пачка блокируется от параллельного удаления
+        ids = session.execute(
+            select(Task.id).where(Task.status == 'completed', Task.completed_at < cutoff)
+            .order_by(Task.completed_at, Task.id).limit(batch_size).with_for_update(skip_locked=True)
+        ).scalars().all()
+        if not ids:
+            break
+        session.execute(insert(ArchivedTask).from_select(
+            _TASK_COLUMNS, select(*(Task.__table__.c[column] for column in _TASK_COLUMNS)).where(Task.id.in_(ids))
+        ))
+        # Завершенные задачи не входят в счетчики навигации - пересчет не нужен
+        session.execute(delete(Task).where(Task.id.in_(ids)).execution_options(counters_handled=True))
+        session.commit()
+        total += len(ids)
+    return total
+
+
+def sqlite_autoincrement_tasks(conn):
+    """Пересоздает tasks в SQLite с AUTOINCREMENT (миграция схемы): id архивных задач не должны
+    выдаваться новым. В PostgreSQL id и так выдает последовательность."""
+    if conn.dialect.name != 'sqlite':
+        return
+    sql = conn.execute(text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'tasks'")).scalar()
+    if 'AUTOINCREMENT' in sql.upper():
+        return
+    columns = ', '.join(Task.__table__.c.keys())
+    # Индексы переносятся такими, какие есть в базе, а не из модели: их набор задают миграции
+    indexes = conn.execute(text(
+        "SELECT name, sql FROM sqlite_master WHERE type = 'index' AND tbl_name = 'tasks' AND sql IS NOT NULL"
+    )).all()
+    for name, _ in indexes:
+        conn.execute(text(f"DROP INDEX {name}"))
+    conn.execute(text("ALTER TABLE tasks RENAME TO tasks_old"))
+    conn.execute(CreateTable(Task.__table__))
+    conn.execute(text(f"INSERT INTO tasks ({columns}) SELECT {columns} FROM tasks_old"))
+    conn.execute(text("DROP TABLE tasks_old"))
+    for _, sql in indexes:
+        conn.execute(text(sql))
+    create_search_index(conn, [('tasks', 'title')])  # триггеры FTS ушли вместе со старой таблицей
+
+
+# --- 2. СЕКЦИИ activity_log ПО МЕСЯЦАМ (PostgreSQL) ---
+
+def _month_start(day):
+    return day.replace(day=1)
+
+def _next_month(day):
+    return (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+def _partition_name(month):
+    return f"activity_log_p{month:%Y_%m}"
+
+def _is_partitioned(conn):
+    return conn.execute(text("SELECT relkind FROM pg_class WHERE oid = to_regclass('activity_log')")).scalar() == 'p'
+
+def _create_month_partition(conn, month):
+    """Секция за месяц month; строки этого месяца из activity_log_default переносятся в нее."""
+    name, start, end = _partition_name(month), month, _next_month(month)
+    if conn.execute(text("SELECT to_regclass(:name)"), {'name': name}).scalar() is not None:
+        return False
+    bounds = f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+    in_default = conn.execute(text(
+        "SELECT EXISTS (SELECT 1 FROM activity_log_default WHERE activity_date >= :start AND activity_date < :end)"
+    ), {'start': start, 'end': end}).scalar()
+    if not in_default:
+        conn.execute(text(f"CREATE TABLE {name} PARTITION OF activity_log {bounds}"))
+        return True
+    # Нельзя создать секцию, пока ее строки лежат в секции по умолчанию: сначала переносим их
+    conn.execute(text(f"CREATE TABLE {name} (LIKE activity_log INCLUDING DEFAULTS INCLUDING GENERATED)"))
+    conn.execute(text(
+        f"WITH moved AS (DELETE FROM activity_log_default WHERE activity_date >= :start AND activity_date < :end "
+        f"RETURNING {_ACTIVITY_COLUMNS}) INSERT INTO {name} ({_ACTIVITY_COLUMNS}) SELECT {_ACTIVITY_COLUMNS} FROM moved"
+    ), {'start': start, 'end': end})
+    conn.execute(text(f"ALTER TABLE activity_log ATTACH PARTITION {name} {bounds}"))
+    return True
+
+def ensure_partitions(conn, months_ahead=PARTITION_MONTHS_AHEAD, today=None):
+    """Секции с текущего месяца на months_ahead вперед и для всех месяцев, попавших в секцию по умолчанию.
+    Возвращает число созданных секций."""
+    if conn.dialect.name != 'postgresql' or not _is_partitioned(conn):
+        return 0
+    month = _month_start(today or date.today())
+    months = set()
+    for _ in range(months_ahead + 1):
+        months.add(month)
+        month = _next_month(month)
+    months.update(conn.execute(text(
+        "SELECT DISTINCT date_trunc('month', activity_date)::date FROM activity_log_default"
+    )).scalars())
+    return sum(_create_month_partition(conn, month) for month in sorted(months))
+
+def partition_activity_log(conn):
+    """Превращает activity_log в секционированную таблицу (миграция схемы; в SQLite ничего не делает)."""
+    if conn.dialect.name != 'postgresql' or _is_partitioned(conn):
+        return
+    conn.execute(text("ALTER TABLE activity_log RENAME TO activity_log_unpartitioned"))
+    conn.execute(text("ALTER TABLE activity_log_unpartitioned RENAME CONSTRAINT activity_log_pkey TO activity_log_unpartitioned_pkey"))
+    conn.execute(text("DROP INDEX IF EXISTS ix_activity_log_search"))
+    # Ключ секционирования обязан входить в первичный ключ; id по-прежнему выдает та же последовательность
+    conn.execute(text(
+        "CREATE TABLE activity_log (LIKE activity_log_unpartitioned INCLUDING DEFAULTS INCLUDING GENERATED) "
+        "PARTITION BY RANGE (activity_date)"
+    ))
+    conn.execute(text("ALTER TABLE activity_log ADD PRIMARY KEY (id, activity_date)"))
+    conn.execute(text("ALTER TABLE activity_log ADD CONSTRAINT activity_log_project_id_fkey FOREIGN KEY (project_id) REFERENCES projects (id) ON DELETE SET NULL"))
+    conn.execute(text("CREATE TABLE activity_log_default PARTITION OF activity_log DEFAULT"))
+    first = conn.execute(text("SELECT min(activity_date) FROM activity_log_unpartitioned")).scalar()
+    month = _month_start(first or date.today())
+    while month <= _month_start(date.today()):
+        _create_month_partition(conn, month)
+        month = _next_month(month)
+    ensure_partitions(conn)
+    conn.execute(text(
+        f"INSERT INTO activity_log ({_ACTIVITY_COLUMNS}) SELECT {_ACTIVITY_COLUMNS} FROM activity_log_unpartitioned"
+    ))
+    conn.execute(text("ALTER SEQUENCE activity_log_id_seq OWNED BY activity_log.id"))
+    conn.execute(text("DROP TABLE activity_log_unpartitioned"))
+    create_search_index(conn, [('activity_log', 'description')])
+
+
+# --- 3. КОМАНДНАЯ СТРОКА ---
+
+def main():
+    parser = argparse.ArgumentParser(description="Архивация завершенных задач и обслуживание секций журнала")
+    parser.add_argument('command', choices=('run', 'archive', 'partitions'))
+    parser.add_argument('--days', type=int, default=ARCHIVE_AFTER_DAYS, help="архивировать задачи, завершенные раньше N дней назад")
+    args = parser.parse_args()
+
+    enable_cross_process_invalidation(engine)  # кэши календаря и архива в других процессах сбросятся
+    if args.command in ('run', 'partitions'):
+        with engine.begin() as conn:
+            print(f"✅ Секций activity_log создано: {ensure_partitions(conn)}")
+    if args.command in ('run', 'archive'):
+        session = SessionLocal()
+        try:
+            print(f"✅ В архив перенесено задач: {archive_completed(session, args.days)}")
+        finally:
+            session.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+# schema.py
+# Версионированная схема БД. Применяется один раз при развертывании (start.sh),
+# а не при импорте приложения: воркеры gunicorn и бот стартуют без обращений к каталогу БД.
+#
+# Использование: python schema.py upgrade | status
+#
+# Каждое изменение схемы - новая запись в конце MIGRATIONS с очередным номером.
+# Уже примененные миграции не меняются: их номера записаны в таблице schema_version.
+
+import sys
+
+from sqlalchemy import func, insert, select, text
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+from database import engine, Base, SchemaVersion, ArchivedTask, fill_activity_rollup
+from counters import recount
+from search import create_search_index
+from retention import partition_activity_log, sqlite_autoincrement_tasks
+
+
+def _create_tables(conn):
+    # IF NOT EXISTS: на уже работающих установках таблицы есть, создаются только недостающие.
+    # Без индексов модели: их создают миграции по именам, иначе новая установка получила бы
+    # сегодняшний набор индексов уже на версии 1
+    for table in Base.metadata.sorted_tables:
+        conn.execute(CreateTable(table, if_not_exists=True))
+
+def _create_indexes(conn, names):
+    # IF NOT EXISTS вместо checkfirst: SQLite не сообщает об индексах по выражениям (lower(...))
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            if index.name in names:
+                conn.execute(CreateIndex(index, if_not_exists=True))
+
+def _indexes(*names):
+    return lambda conn: _create_indexes(conn, names)
+
+def _picker_indexes(conn):
+    # Явный DDL: миграция 7 заменила эти индексы частичными, и в модели их больше нет
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_tasks_today_id ON tasks (status, is_today, id)"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_tasks_inbox_id ON tasks (project_id, status, is_today, id)"))
+
+def _pending_indexes(conn):
+    # Полные индексы страниц выбора задач заменяются частичными (только status = 'pending')
+    for name in ('ix_tasks_today_id', 'ix_tasks_inbox_id'):
+        conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+    _create_indexes(conn, ('ix_tasks_pending_today', 'ix_tasks_pending_project'))
+
+def _create_task_archive(conn):
+    sqlite_autoincrement_tasks(conn)
+    _create_tables(conn)
+    _create_indexes(conn, [index.name for index in ArchivedTask.__table__.indexes])
+    create_search_index(conn, [('tasks_archive', 'title')])
+
+def _reindex_lower(conn):
+    # Индексы по lower(...) в SQLite были построены встроенной lower(), которая не знает кириллицы;
+    # database.py подменяет ее на lower() с Юникодом, и записи индексов нужно пересчитать
+    if conn.dialect.name == 'sqlite':
+        for name in ('ix_projects_name_prefix', 'ix_tasks_title_prefix'):
+            conn.execute(text(f"REINDEX {name}"))
+
+def _fill_derived(conn):
+    # Сводки журнала активности и счетчики навигации для данных, записанных до их появления
+    fill_activity_rollup(conn)
+    recount(conn)
+
+MIGRATIONS = [
+    (1, "Таблицы", _create_tables),
+    (2, "Индексы для частых запросов", _indexes('ix_projects_name_prefix', 'ix_tasks_project_status', 'ix_tasks_deadline',
+                                                'ix_tasks_completed_at_id', 'ix_tasks_title_prefix')),
+    (3, "Заполнение сводок активности и счетчиков", _fill_derived),
+    (4, "Индексы для страниц выбора задач в боте", _picker_indexes),
+    (5, "Полнотекстовый поиск по задачам и журналу", create_search_index),
+    (6, "Архив завершенных задач (tasks_archive)", _create_task_archive),
+    (7, "Частичные индексы по открытым задачам", _pending_indexes),
+    (8, "Секционирование activity_log по месяцам (PostgreSQL)", partition_activity_log),
+    (9, "Индекс выполненных задач по дате завершения", _indexes('ix_tasks_status_completed_at')),
+    (10, "Индексы по lower(...) с регистром кириллицы (SQLite)", _reindex_lower),
+]
+
+
+def current_version(bind=engine):
+    with bind.begin() as conn:
+        SchemaVersion.__table__.create(bind=conn, checkfirst=True)
+        return conn.execute(select(func.max(SchemaVersion.version))).scalar() or 0
+
+def latest_version():
+    return MIGRATIONS[-1][0]
+
+def upgrade(bind=engine):
+    """Применяет недостающие миграции, каждую в своей транзакции. Возвращает номер версии."""
+    version = current_version(bind)
+    for number, description, apply in MIGRATIONS:
+        if number <= version:
+            continue
+        with bind.begin() as conn:
+            apply(conn)
+            conn.execute(insert(SchemaVersion).values(version=number, description=description))
+        print(f"✅ Схема обновлена до версии {number}: {description}")
+        version = number
+    print(f"✅ Версия схемы: {version}")
+    return version
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else None
+    if command == 'upgrade':
+        upgrade()
+    elif command == 'status':
+        version = current_version()
+        print(f"Версия схемы: {version}, последняя: {latest_version()}")
+        sys.exit(0 if version == latest_version() else 1)
+    else:
+        print("Использование: python schema.py upgrade | status")
+        sys.exit(1)
@@ -0,0 +1,139 @@
+# search.py
+# Полнотекстовый поиск по названиям задач (включая архив tasks_archive) и записям журнала активности.
+#
+# PostgreSQL: вычисляемая колонка search_vector (tsvector, словарь russian) с GIN-индексом
+# в tasks, tasks_archive и activity_log; запрос разбирается websearch_to_tsquery, порядок - ts_rank_cd.
+# SQLite: таблицы FTS5 <таблица>_fts (внешнее содержимое + триггеры),
+# слова запроса ищутся по префиксу, порядок - bm25.
+# Индексы создаются миграцией схемы (python schema.py upgrade).
+
+import re
+from datetime import timedelta
+
+from sqlalchemy import select, func, literal, literal_column, cast, union_all, table, column, text, Date, String
+
+from database import Project, Task, ArchivedTask, ActivityLog
+
+FTS_CONFIG = 'russian'
+SEARCH_PAGE_SIZE = 20
+SEARCH_KINDS = ('all', 'tasks', 'activity')
+TASK_STATUSES = ('pending', 'completed')
+
+_WORD_RE = re.compile(r'\w+')
+
+
+# --- 1. ИНДЕКСЫ (вызывается из schema.py) ---
+
+# (таблица, колонка с текстом)
+SEARCH_SOURCES = [('tasks', 'title'), ('activity_log', 'description')]
+
+def _postgres_ddl(source, field):
+    return [
+        f"ALTER TABLE {source} ADD COLUMN IF NOT EXISTS search_vector tsvector "
+        f"GENERATED ALWAYS AS (to_tsvector('{FTS_CONFIG}', coalesce({field}, ''))) STORED",
+        f"CREATE INDEX IF NOT EXISTS ix_{source}_search ON {source} USING gin (search_vector)",
+    ]
+
+def _sqlite_ddl(source, field):
+    # FTS5 с внешним содержимым: хранит только индекс, текст берет из исходной таблицы;
+    # триггеры держат индекс в актуальном состоянии при любых вставках (в т.ч. executemany)
+    fts = f'{source}_fts'
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({field}, content='{source}', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {source} BEGIN "
+        f"INSERT INTO {fts}(rowid, {field}) VALUES (new.id, new.{field}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {source} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {field}) VALUES ('delete', old.id, old.{field}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {field} ON {source} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {field}) VALUES ('delete', old.id, old.{field}); "
+        f"INSERT INTO {fts}(rowid, {field}) VALUES (new.id, new.{field}); END",
+        f"INSERT INTO {fts}({fts}) VALUES ('rebuild')",
+    ]
+
+def create_search_index(conn, sources=SEARCH_SOURCES):
+    if conn.dialect.name == 'postgresql': ddl = _postgres_ddl
+    elif conn.dialect.name == 'sqlite': ddl = _sqlite_ddl
+    else: return
+    for source, field in sources:
+        for statement in ddl(source, field):
+            conn.execute(text(statement))
+
+
+# --- 2. ПОИСК ---
+
+def _fts5_query(q):
+    # Каждое слово - в кавычках (никакого синтаксиса FTS5 от пользователя) и по префиксу
+    return ' '.join(f'"{word}"*' for word in _WORD_RE.findall(q))
+
+def _match(dialect, source, q):
+    """(условие совпадения, релевантность, нужный JOIN или None) для таблицы source."""
+    if dialect == 'postgresql':
+        query = func.websearch_to_tsquery(FTS_CONFIG, q)
+        vector = literal_column(f'{source}.search_vector')
+        return vector.op('@@')(query), func.ts_rank_cd(vector, query), None
+    fts = table(f'{source}_fts', column('rowid'))
+    # bm25 тем меньше, чем лучше совпадение, поэтому меняем знак
+    return (literal_column(fts.name).op('MATCH')(_fts5_query(q)), -func.bm25(literal_column(fts.name)),
+            (fts, fts.c.rowid == literal_column(f'{source}.id')))
+
+def _task_query(model, dialect, q, project_name, status, start, end):
+    # model - Task или ArchivedTask: у них одинаковые колонки
+    matches, rank, join = _match(dialect, model.__tablename__, q)
+    at = func.coalesce(model.completed_at, model.created_at)
+    # CAST(... AS DATE) в SQLite дает число (год), поэтому там - функция date()
+    day = func.date(at, type_=Date) if dialect == 'sqlite' else cast(at, Date)
+    stmt = (
+        select(literal('task').label('kind'), model.id, model.title.label('text'), model.status,
+               day.label('day'), Project.name.label('project_name'), rank.label('rank'))
+        .select_from(model)
+    )
+    if join is not None: stmt = stmt.join(*join)
+    stmt = stmt.outerjoin(Project, model.project_id == Project.id).where(matches)
+    if project_name: stmt = stmt.where(Project.name == project_name)
+    if status: stmt = stmt.where(model.status == status)
+    if start: stmt = stmt.where(at >= start)
+    if end: stmt = stmt.where(at < end + timedelta(days=1))
+    return stmt
+
+def _activity_query(dialect, q, project_name, start, end):
+    matches, rank, join = _match(dialect, 'activity_log', q)
+    stmt = (
+        select(literal('activity').label('kind'), ActivityLog.id, ActivityLog.description.label('text'),
+               cast(literal(None), String).label('status'), ActivityLog.activity_date.label('day'),
+               Project.name.label('project_name'), rank.label('rank'))
+        .select_from(ActivityLog)
+    )
+    if join is not None: stmt = stmt.join(*join)
+    stmt = stmt.outerjoin(Project, ActivityLog.project_id == Project.id).where(matches)
+    if project_name: stmt = stmt.where(Project.name == project_name)
+    if start: stmt = stmt.where(ActivityLog.activity_date >= start)
+    if end: stmt = stmt.where(ActivityLog.activity_date <= end)
+    return stmt
+
+def search(session, q, kind='all', project_name=None, status=None, start=None, end=None, page=1, limit=SEARCH_PAGE_SIZE):
+    """
+    Ищет q в задачах и/или журнале активности, самые релевантные - первыми.
+    Строки: kind ('task' | 'activity'), id, text, status, day, project_name, rank.
+    Фильтр status относится только к задачам, поэтому записи журнала с ним не ищутся.
+    Возвращает (строки страницы page, есть ли следующая страница).
+    """
+    if not _WORD_RE.search(q or ''):
+        return [], False
+    dialect = session.get_bind().dialect.name
+    parts = []
+    if kind in ('all', 'tasks'):
+        parts.append(_task_query(Task, dialect, q, project_name, status, start, end))
+        if status != 'pending':  # в архиве только завершенные задачи
+            parts.append(_task_query(ArchivedTask, dialect, q, project_name, status, start, end))
+    if kind in ('all', 'activity') and not status:
+        parts.append(_activity_query(dialect, q, project_name, start, end))
+    if not parts:
+        return [], False
+    combined = (parts[0] if len(parts) == 1 else union_all(*parts)).subquery()
+    stmt = (
+        select(combined)
+        .order_by(combined.c.rank.desc(), combined.c.id.desc())
+        .limit(limit + 1).offset((max(page, 1) - 1) * limit)
+    )
+    rows = session.execute(stmt).all()
+    return rows[:limit], len(rows) > limit
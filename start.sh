@@ -15,7 +15,8 @@ fi
 
 # --- НОВЫЙ Шаг 2: Автоматическая настройка базы данных ---
 echo "⚙️  Проверяю состояние базы данных..."
-python database.py init
+python schema.py upgrade
+python retention.py run
 echo "-------------------------------------"
 
 
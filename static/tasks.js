@@ -0,0 +1,42 @@
+// static/tasks.js
+// Действия с задачами без перезагрузки страницы: формы с атрибутом data-api уходят в JSON API,
+// а строка задачи заменяется фрагментом HTML из ответа или убирается.
+// Если запрос не удался, форма отправляется обычным способом (с перезагрузкой).
+
+function rowFromHtml(html) {
+    const template = document.createElement('template');
+    template.innerHTML = html.trim();
+    return template.content.firstElementChild;
+}
+
+document.addEventListener('submit', async (event) => {
+    const form = event.target;
+    if (!form.dataset.api) return;
+    event.preventDefault();
+    const isAdd = form.classList.contains('add-form');
+    const options = { method: 'POST' };
+    if (isAdd) {
+        options.headers = { 'Content-Type': 'application/json' };
+        options.body = JSON.stringify(Object.fromEntries(new FormData(form)));
+    }
+    let data;
+    try {
+        const response = await fetch(form.dataset.api, options);
+        if (!response.ok) throw new Error(response.status);
+        data = await response.json();
+    } catch (e) {
+        form.submit();
+        return;
+    }
+    for (const id of data.deleted) document.querySelector(`[data-task-id="${id}"]`)?.remove();
+    for (const task of data.tasks) {
+        const row = document.querySelector(`[data-task-id="${task.id}"]`);
+        if (!task.html) { row?.remove(); continue; }
+        if (row) { row.replaceWith(rowFromHtml(task.html)); continue; }
+        // Новая задача: в список над формой добавления, убрав заглушку "пусто"
+        const list = form.parentElement.querySelector('.task-list');
+        list.querySelectorAll('li:not([data-task-id])').forEach((li) => li.remove());
+        list.append(rowFromHtml(task.html));
+    }
+    if (isAdd) form.reset();
+});
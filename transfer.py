@@ -0,0 +1,276 @@
+# transfer.py
+# Резервная копия и перенос данных: потоковый экспорт и массовый импорт
+# таблиц projects, tasks и activity_log в форматах CSV и JSON Lines.
+#
+# Экспорт читает базу серверным курсором (yield_per) и никогда не держит в памяти всю таблицу.
+# Импорт пишет пачками: в PostgreSQL через COPY, в SQLite через executemany.
+# Проекты в файлах указываются по имени (колонка project) и разрешаются в id за один проход;
+# id строк из файла не используются - база выдает новые.
+#
+# Использование:
+#   python transfer.py export tasks [--format csv|jsonl] [-o tasks.csv]
+#   python transfer.py import tasks tasks.csv [--format csv|jsonl]
+# Порядок при переносе: projects, затем tasks и activity_log.
+
+import argparse
+import csv
+import io
+import json
+import sys
+import time
+from datetime import date, datetime, timezone
+from decimal import Decimal
+
+from sqlalchemy import select, insert, union_all
+
+from database import engine, SessionLocal, Project, Task, ArchivedTask, ActivityLog, fill_activity_rollup
+from cache import mark_changed, enable_cross_process_invalidation
+from counters import recount
+from queries import project_directory
+
+FORMATS = ('csv', 'jsonl')
+EXPORT_BATCH = 1000
+IMPORT_BATCH = 5000
+
+
+class TableSpec:
+    def __init__(self, model, export_columns, import_columns, types, archive_model=None):
+        self.model = model
+        self.export_columns = export_columns  # колонки файла
+        self.import_columns = import_columns  # колонки таблицы, которые заполняет импорт
+        self.types = types                    # преобразование значений из файла
+        self.archive_model = archive_model    # холодная часть таблицы (экспортируется вместе с ней)
+
+    @property
+    def table(self):
+        return self.model.__table__
+
+
+def _bool(value):
+    if isinstance(value, bool): return value
+    return str(value).strip().lower() in ('1', 'true', 't', 'yes', 'y')
+
+def _date(value):
+    return value if isinstance(value, date) else date.fromisoformat(value)
+
+def _datetime(value):
+    return value if isinstance(value, datetime) else datetime.fromisoformat(value)
+
+TABLES = {
+    'projects': TableSpec(
+        Project, ('id', 'name', 'created_at'), ('name', 'created_at'),
+        {'created_at': _datetime},
+    ),
+    'tasks': TableSpec(
+        Task, ('id', 'title', 'status', 'created_at', 'completed_at', 'is_today', 'priority', 'deadline', 'project'),
+        ('title', 'status', 'created_at', 'completed_at', 'is_today', 'priority', 'deadline', 'project_id'),
+        {'created_at': _datetime, 'completed_at': _datetime, 'is_today': _bool, 'deadline': _date},
+        archive_model=ArchivedTask,
+    ),
+    'activity_log': TableSpec(
+        ActivityLog, ('id', 'description', 'duration_hours', 'activity_date', 'project'),
+        ('description', 'duration_hours', 'activity_date', 'project_id'),
+        {'duration_hours': Decimal, 'activity_date': _date},
+    ),
+}
+
+_DEFAULTS = {'status': 'pending', 'is_today': False, 'priority': 'low'}
+
+
+# --- 1. ЭКСПОРТ ---
+
+def _export_query(name):
+    spec = TABLES[name]
+    table = spec.table
+    if spec.archive_model is not None:
+        # Задачи из архива выгружаются вместе с остальными (при импорте попадут в tasks,
+        # а следующий запуск retention.py снова перенесет старые в архив)
+        columns = [column for column in table.c.keys() if column in spec.archive_model.__table__.c]
+        table = union_all(*(select(*(model.__table__.c[column] for column in columns)) for model in (spec.model, spec.archive_model))).subquery(table.name)
+    if 'project' not in spec.export_columns:
+        return select(*(table.c[column] for column in spec.export_columns)).order_by(table.c.id)
+    # Имя проекта вместо id: файл можно загрузить в другую базу
+    columns = [table.c[column] for column in spec.export_columns if column != 'project']
+    return (
+        select(*columns, Project.name.label('project'))
+        .outerjoin(Project, table.c.project_id == Project.id)
+        .order_by(table.c.id)
+    )
+
+def iter_rows(session, name, batch_size=EXPORT_BATCH):
+    """Строки таблицы потоком через серверный курсор."""
+    yield from session.execute(_export_query(name).execution_options(yield_per=batch_size))
+
+def _json_default(value):
+    if isinstance(value, (date, datetime)): return value.isoformat()
+    if isinstance(value, Decimal): return str(value)
+    raise TypeError(f"Не умею сериализовать {type(value).__name__}")
+
+def iter_export(session, name, fmt='csv', batch_size=EXPORT_BATCH, stats=None):
+    """Готовые куски файла экспорта (строки str), по пачке строк таблицы на кусок.
+    В stats['rows'], если передан, накапливается число выгруженных строк."""
+    columns = TABLES[name].export_columns
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if fmt == 'csv':
+        writer.writerow(columns)
+    count = 0
+    for row in iter_rows(session, name, batch_size):
+        if fmt == 'csv':
+            writer.writerow(['' if value is None else value.isoformat() if isinstance(value, (date, datetime)) else value for value in row])
+        else:
+            buffer.write(json.dumps(dict(zip(columns, row)), ensure_ascii=False, default=_json_default) + '\n')
+        count += 1
+        if stats is not None: stats['rows'] = count
+        if count % batch_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0); buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+# --- 2. ИМПОРТ ---
+
+def read_records(stream, fmt):
+    """Словари из CSV (с заголовком) или JSON Lines; пустые значения CSV становятся None."""
+    if fmt == 'csv':
+        for record in csv.DictReader(stream):
+            yield {key: (value if value != '' else None) for key, value in record.items()}
+    else:
+        for line in stream:
+            if line.strip():
+                yield json.loads(line)
+
+class _ProjectResolver:
+    """Имя проекта -> id за один проход: справочник читается один раз, новые проекты создаются по ходу."""
+
+    def __init__(self, session):
+        self.session = session
+        self.ids = dict(project_directory(session).id_by_name)
+        self.created = 0
+
+    def __call__(self, name):
+        if not name:
+            return None
+        name = str(name).strip().lstrip('#')
+        if name not in self.ids:
+            self.ids[name] = self.session.execute(insert(Project).values(name=name).returning(Project.id)).scalar_one()
+            self.created += 1
+        return self.ids[name]
+
+def _convert(spec, record, resolve_project, now):
+    row = {}
+    for column in spec.import_columns:
+        if column == 'project_id':
+            row[column] = resolve_project(record.get('project'))
+            continue
+        value = record.get(column)
+        if value is None:
+            value = now if column == 'created_at' else _DEFAULTS.get(column)
+        elif column in spec.types:
+            value = spec.types[column](value)
+        row[column] = value
+    return row
+
+def _copy_rows(connection, spec, rows):
+    # PostgreSQL: одна команда COPY на пачку, значения передаются как CSV (пустое поле - NULL)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow(['' if row[column] is None else row[column] for column in spec.import_columns])
+    buffer.seek(0)
+    cursor = connection.connection.driver_connection.cursor()
+    try:
+        cursor.copy_expert(f"COPY {spec.table.name} ({', '.join(spec.import_columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+    finally:
+        cursor.close()
+
+def import_records(session, name, records, batch_size=IMPORT_BATCH):
+    """
+    Загружает записи в таблицу name одной транзакцией (без коммита).
+    Возвращает (загружено строк, создано проектов).
+    """
+    spec = TABLES[name]
+    connection = session.connection()
+    use_copy = connection.dialect.name == 'postgresql'
+    now = datetime.now(timezone.utc)
+    resolve_project = _ProjectResolver(session)
+    existing_projects = set(resolve_project.ids) if name == 'projects' else None
+
+    def flush(batch):
+        if use_copy: _copy_rows(connection, spec, batch)
+        else: connection.execute(insert(spec.table), batch)
+
+    batch, total = [], 0
+    for record in records:
+        if name == 'projects':
+            # Проекты уникальны по имени: уже существующие пропускаем
+            project_name = str(record.get('name') or '').strip()
+            if not project_name or project_name in existing_projects:
+                continue
+            existing_projects.add(project_name)
+            record = {**record, 'name': project_name}
+        row = _convert(spec, record, resolve_project, now)
+        batch.append(row)
+        if len(batch) >= batch_size:
+            flush(batch); total += len(batch); batch = []
+    if batch:
+        flush(batch); total += len(batch)
+
+    # Счетчики и сводки поддерживаются событиями ORM, а COPY/executemany идут мимо них
+    if name == 'tasks':
+        recount(connection)
+        mark_changed(session, 'tasks', 'counters')
+    elif name == 'activity_log':
+        fill_activity_rollup(connection)
+        mark_changed(session, 'activity_log', 'activity_daily', 'project_activity_daily')
+    if name == 'projects' or resolve_project.created:
+        mark_changed(session, 'projects')
+    return total, resolve_project.created
+
+
+# --- 3. КОМАНДНАЯ СТРОКА ---
+
+def _rate(rows, seconds):
+    return f"{rows} строк за {seconds:.1f} с ({rows / seconds if seconds else 0:.0f} строк/с)"
+
+def main():
+    parser = argparse.ArgumentParser(description="Экспорт и импорт задач, проектов и журнала активности")
+    commands = parser.add_subparsers(dest='command', required=True)
+    export_parser = commands.add_parser('export')
+    export_parser.add_argument('table', choices=TABLES)
+    export_parser.add_argument('--format', choices=FORMATS, default='csv')
+    export_parser.add_argument('-o', '--output', help="файл (по умолчанию stdout)")
+    import_parser = commands.add_parser('import')
+    import_parser.add_argument('table', choices=TABLES)
+    import_parser.add_argument('file')
+    import_parser.add_argument('--format', choices=FORMATS, help="по умолчанию - по расширению файла")
+    args = parser.parse_args()
+
+    enable_cross_process_invalidation(engine)  # после импорта другие процессы сбросят кэши
+    session = SessionLocal()
+    started = time.perf_counter()
+    try:
+        if args.command == 'export':
+            output = open(args.output, 'w', encoding='utf-8', newline='') if args.output else sys.stdout
+            stats = {'rows': 0}
+            try:
+                for chunk in iter_export(session, args.table, args.format, stats=stats):
+                    output.write(chunk)
+            finally:
+                if args.output: output.close()
+            print(f"✅ Экспорт {args.table}: {_rate(stats['rows'], time.perf_counter() - started)}", file=sys.stderr)
+        else:
+            fmt = args.format or ('jsonl' if args.file.endswith(('.jsonl', '.json')) else 'csv')
+            with open(args.file, encoding='utf-8', newline='') as stream:
+                rows, created = import_records(session, args.table, read_records(stream, fmt))
+            session.commit()
+            message = f"✅ Импорт {args.table}: {_rate(rows, time.perf_counter() - started)}"
+            if created: message += f"; создано проектов: {created}"
+            print(message)
+    finally:
+        session.close()
+
+
+if __name__ == "__main__":
+    main()